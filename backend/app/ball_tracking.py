@@ -0,0 +1,256 @@
+import os
+import cv2
+import numpy as np
+
+from .metrics import torso_length, to_pixels, LEFT_WRIST, RIGHT_WRIST
+from .landmarks import MIN_VISIBILITY
+
+#frames are downscaled to this width for detection, a ball is only a few pixels either way
+DETECTION_WIDTH = 320
+
+#optic yellow tennis ball in OpenCV HSV (hue 0-180)
+BALL_HSV_LOWER = (22, 60, 110)
+BALL_HSV_UPPER = (48, 255, 255)
+
+#assumed shoulder to hip distance of a player, converts body-scaled speeds to km/h
+TORSO_METRES = float(os.environ.get("RV_TORSO_METRES", 0.5))
+
+
+class _BallKalman:
+    """
+    Constant velocity Kalman filter over (x, y, vx, vy) in detection pixels per frame
+    Small enough to write out in NumPy, the matrices are 4x4
+    """
+
+    F = np.array([[1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=np.float64)
+    H = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float64)
+
+    def __init__(self, position, process_noise=4.0, measurement_noise=1.0):
+        self.x = np.array([position[0], position[1], 0.0, 0.0])
+        self.P = np.diag([measurement_noise, measurement_noise, 100.0, 100.0])
+        #white acceleration noise model
+        self.Q = process_noise * np.array(
+            [[0.25, 0, 0.5, 0], [0, 0.25, 0, 0.5], [0.5, 0, 1, 0], [0, 0.5, 0, 1]]
+        )
+        self.R = measurement_noise * np.eye(2)
+
+    def predict(self):
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.x[:2]
+
+    def gate_distances(self, points):
+        """Squared Mahalanobis distance of every candidate (n, 2) from the predicted position"""
+        S = self.H @ self.P @ self.H.T + self.R
+        d = points - self.x[:2]
+        return np.einsum("ni,ij,nj->n", d, np.linalg.inv(S), d)
+
+    def update(self, z):
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self.x[:2])
+        self.P = (np.eye(4) - K @ self.H) @ self.P
+        return self.x[:2]
+
+
+class BallTracker:
+    """
+    Track a tennis ball on frames that are already decoded for pose inference
+    Each frame is downscaled, moving pixels from a background subtractor are
+    combined with a ball colour mask, blobs are filtered by size and shape in one
+    vectorized pass, and a Kalman filter picks the blob that continues the trajectory
+    Positions are kept in normalized frame coordinates like pose landmarks
+    """
+
+    def __init__(self, detection_width=DETECTION_WIDTH, gate=16.0, max_missed=4, max_jump=0.25):
+        self.detection_width = detection_width
+        self.gate = gate
+        self.max_missed = max_missed
+        self.max_jump = max_jump
+        self.reset()
+
+    def reset(self):
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(history=120, varThreshold=25, detectShadows=False)
+        self._kalman = None
+        self._missed = 0
+        self._size = None
+        #detected (raw) and filtered positions per frame, NaN where the ball was not found
+        self.measured = []
+        self.filtered = []
+
+    def _candidates(self, frame_bgr):
+        """Centres and fill scores of ball-like blobs in detection pixels"""
+        height, width = frame_bgr.shape[:2]
+        scale = self.detection_width / width
+        small = cv2.resize(frame_bgr, (self.detection_width, max(1, int(round(height * scale)))),
+                           interpolation=cv2.INTER_AREA)
+        self._size = (small.shape[1], small.shape[0])
+
+        moving = self._subtractor.apply(small)
+        colour = cv2.inRange(cv2.cvtColor(small, cv2.COLOR_BGR2HSV), BALL_HSV_LOWER, BALL_HSV_UPPER)
+        mask = cv2.bitwise_and(moving, colour)
+        mask = cv2.dilate(mask, np.ones((2, 2), np.uint8))
+
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        #label 0 is the background
+        stats, centroids = stats[1:], centroids[1:]
+        if count <= 1:
+            return np.empty((0, 2)), np.empty(0)
+
+        w = stats[:, cv2.CC_STAT_WIDTH]
+        h = stats[:, cv2.CC_STAT_HEIGHT]
+        area = stats[:, cv2.CC_STAT_AREA]
+        max_area = (0.04 * self.detection_width) ** 2
+        fill = area / (w * h)
+        #motion blur stretches a fast ball, so allow elongated but compact blobs
+        keep = (area >= 2) & (area <= max_area) & (np.maximum(w, h) <= 3 * np.minimum(w, h)) & (fill >= 0.35)
+        return centroids[keep], fill[keep]
+
+    def update(self, frame_bgr):
+        """Track the ball on one frame, returns its normalized (x, y) or None"""
+        points, scores = self._candidates(frame_bgr)
+        measured = None
+
+        if self._kalman is not None:
+            prediction = self._kalman.predict()
+            if len(points):
+                distances = self._kalman.gate_distances(points)
+                best = int(np.argmin(distances))
+                if distances[best] <= self.gate:
+                    measured = points[best]
+                elif self._missed:
+                    #a hit or bounce breaks the constant velocity model, restart on the
+                    #closest blob instead of losing the ball for several frames
+                    jumps = np.linalg.norm(points - prediction, axis=1)
+                    best = int(np.argmin(jumps))
+                    if jumps[best] <= self.max_jump * self.detection_width:
+                        self._kalman = _BallKalman(points[best])
+                        measured = points[best]
+        elif len(points):
+            measured = points[int(np.argmax(scores))]
+            self._kalman = _BallKalman(measured)
+
+        if measured is None:
+            self._missed += 1
+            if self._kalman is not None and self._missed > self.max_missed:
+                self._kalman = None
+            self.measured.append((np.nan, np.nan))
+            self.filtered.append((np.nan, np.nan))
+            return None
+
+        self._missed = 0
+        position = self._kalman.update(measured)
+        size = np.array(self._size, dtype=np.float64)
+        self.measured.append(tuple(measured / size))
+        self.filtered.append(tuple(position / size))
+        return self.filtered[-1]
+
+    def trajectory(self):
+        """Filtered (frames, 2) normalized positions, NaN where the ball was not found"""
+        return np.array(self.filtered, dtype=np.float32).reshape(-1, 2)
+
+    def measurements(self):
+        """Raw detected (frames, 2) normalized positions"""
+        return np.array(self.measured, dtype=np.float32).reshape(-1, 2)
+
+
+def draw_ball(frame_bgr, recent, color=(0, 200, 255)):
+    """
+    Draw the ball and its trail onto a BGR frame in place
+    recent holds the last normalized positions, oldest first, ending with the current frame
+    """
+    height, width = frame_bgr.shape[:2]
+    points = [
+        (int(round(x * width)), int(round(y * height))) if not np.isnan(x) else None
+        for x, y in recent
+    ]
+    for start, end in zip(points, points[1:]):
+        if start is not None and end is not None:
+            cv2.line(frame_bgr, start, end, color, 1)
+    if points and points[-1] is not None:
+        cv2.circle(frame_bgr, points[-1], 4, color, 2)
+
+
+def _fit_speed(positions, fps, aspect):
+    """Least squares speed of (n, 2) normalized positions in height units per second, None if too few"""
+    frames = np.flatnonzero(~np.isnan(positions).any(axis=1))
+    if len(frames) < 3:
+        return None
+    points = to_pixels(positions[frames], aspect)
+    t = frames / fps
+    #slope of x and y against time in one solve
+    A = np.stack([t, np.ones_like(t)], axis=1)
+    (velocity, _), *_ = np.linalg.lstsq(A, points, rcond=None)
+    return float(np.linalg.norm(velocity))
+
+
+def estimate_shot(measured, landmarks, fps, aspect=1.0, window_seconds=0.2, contact_torsos=1.5):
+    """
+    Find the racket contact and the ball speed coming off it
+    measured is the (frames, 2) raw ball track, landmarks a (frames, players, 33, 4)
+    array with NaN where a player was not seen
+    Contact is the frame where the ball comes closest to a wrist, within
+    contact_torsos torso lengths to allow for the racket. Without a pose close
+    enough, the sharpest turn in the ball's path is used instead
+    Speed is fitted over window_seconds after contact and reported in torso lengths
+    per second and in km/h using TORSO_METRES. It is the speed across the image, so
+    the part of the motion towards or away from the camera is not included
+    Returns a JSON friendly dict, values are None when they cannot be estimated
+    """
+    frames = len(measured)
+    tracked = ~np.isnan(measured).any(axis=1)
+    shot = {
+        "frames_tracked": int(tracked.sum()),
+        "detection_rate": float(tracked.mean()) if frames else 0.0,
+        "contact_frame": None,
+        "contact_seconds": None,
+        "contact_source": None,
+        "shot_speed_torso_per_s": None,
+        "shot_speed_kmh": None,
+    }
+    if shot["frames_tracked"] < 3:
+        return shot
+
+    ball = to_pixels(measured, aspect)
+    torso = torso_length(landmarks, aspect)
+    contact = None
+
+    if landmarks.shape[1]:
+        wrists = landmarks[:, :, [LEFT_WRIST, RIGHT_WRIST]]
+        wrist_points = np.where((wrists[..., 3:] >= MIN_VISIBILITY), to_pixels(wrists, aspect), np.nan)
+        #distance from the ball to every wrist of every player, in that player's torso lengths
+        with np.errstate(all="ignore"):
+            gaps = np.linalg.norm(wrist_points - ball[:, None, None, :], axis=-1) / torso[:, :, None]
+        gaps = np.where(np.isnan(gaps), np.inf, gaps).min(axis=(1, 2))
+        if np.isfinite(gaps).any() and gaps.min() <= contact_torsos:
+            contact = int(np.argmin(gaps))
+            shot["contact_source"] = "wrist"
+
+    if contact is None:
+        #the hit is where the direction of travel changes most
+        idx = np.flatnonzero(tracked)
+        velocity = np.diff(ball[idx], axis=0) / np.diff(idx)[:, None]
+        if len(velocity) >= 2:
+            with np.errstate(all="ignore"):
+                unit = velocity / np.linalg.norm(velocity, axis=1, keepdims=True)
+            turn = 1.0 - (unit[1:] * unit[:-1]).sum(axis=1)
+            if np.isfinite(turn).any():
+                contact = int(idx[1:-1][np.nanargmax(turn)])
+                shot["contact_source"] = "trajectory"
+
+    if contact is None:
+        return shot
+
+    shot["contact_frame"] = contact
+    shot["contact_seconds"] = round(contact / fps, 3)
+
+    window = max(3, int(round(window_seconds * fps)))
+    speed = _fit_speed(measured[contact + 1:contact + 1 + window], fps, aspect)
+    #body scale around the contact, any visible player works since they share the camera
+    nearby = torso[max(0, contact - window):contact + window + 1]
+    with np.errstate(all="ignore"):
+        scale = np.nanmedian(nearby) if np.isfinite(nearby).any() else np.nan
+    if speed is not None and np.isfinite(scale) and scale > 0:
+        shot["shot_speed_torso_per_s"] = round(speed / scale, 2)
+        shot["shot_speed_kmh"] = round(speed / scale * TORSO_METRES * 3.6, 1)
+    return shot
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+#set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+#persistent data lives next to the app rather than in the temp directory
+DATA_DIR = os.environ.get(
+    "RV_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+DB_PATH = os.environ.get("RV_DB_PATH", os.path.join(DATA_DIR, "racketvision.db"))
+LANDMARKS_DIR = os.path.join(DATA_DIR, "landmarks")
+
+#upper bound on page sizes for history queries
+MAX_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    user_id TEXT,
+    session_id TEXT,
+    filename TEXT,
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    players INTEGER NOT NULL DEFAULT 1,
+    smoothing TEXT,
+    output TEXT NOT NULL DEFAULT 'mp4',
+    original_url TEXT,
+    processed_url TEXT,
+    landmarks_path TEXT,
+    frames INTEGER,
+    frames_with_pose INTEGER,
+    detection_rate REAL,
+    duration_seconds REAL,
+    processing_seconds REAL,
+    total_seconds REAL,
+    metrics TEXT,
+    timings TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_user_created ON analyses (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_user_session ON analyses (user_id, session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_session_created ON analyses (session_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_hash ON analyses (content_hash);
+
+-- per-session rollup kept current by a trigger, so session queries never scan
+-- every analysis of a user; user_key is user_id with NULL mapped to ''
+CREATE TABLE IF NOT EXISTS sessions (
+    user_key TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    clips INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    total_frames INTEGER NOT NULL,
+    frames_with_pose INTEGER NOT NULL,
+    total_duration_seconds REAL NOT NULL,
+    total_processing_seconds REAL NOT NULL,
+    processed_clips INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    PRIMARY KEY (user_key, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_ended ON sessions (user_key, ended_at DESC);
+CREATE INDEX IF NOT EXISTS idx_sessions_ended ON sessions (ended_at DESC);
+
+CREATE TRIGGER IF NOT EXISTS trg_analyses_session_rollup
+AFTER INSERT ON analyses WHEN NEW.session_id IS NOT NULL
+BEGIN
+    INSERT INTO sessions VALUES (
+        COALESCE(NEW.user_id, ''), NEW.session_id, 1,
+        NEW.status = 'done', NEW.status = 'error',
+        COALESCE(NEW.frames, 0), COALESCE(NEW.frames_with_pose, 0),
+        COALESCE(NEW.duration_seconds, 0), COALESCE(NEW.processing_seconds, 0),
+        NEW.processing_seconds IS NOT NULL, NEW.created_at, NEW.created_at
+    )
+    ON CONFLICT (user_key, session_id) DO UPDATE SET
+        clips = clips + 1,
+        succeeded = succeeded + excluded.succeeded,
+        failed = failed + excluded.failed,
+        total_frames = total_frames + excluded.total_frames,
+        frames_with_pose = frames_with_pose + excluded.frames_with_pose,
+        total_duration_seconds = total_duration_seconds + excluded.total_duration_seconds,
+        total_processing_seconds = total_processing_seconds + excluded.total_processing_seconds,
+        processed_clips = processed_clips + excluded.processed_clips,
+        started_at = MIN(started_at, excluded.started_at),
+        ended_at = MAX(ended_at, excluded.ended_at);
+END;
+"""
+
+#columns that can be set when recording an analysis
+COLUMNS = (
+    "created_at", "user_id", "session_id", "filename", "content_hash", "status", "players",
+    "smoothing", "output", "original_url", "processed_url", "landmarks_path", "frames",
+    "frames_with_pose", "detection_rate", "duration_seconds", "processing_seconds",
+    "total_seconds", "metrics", "timings", "detail",
+)
+
+#stored as JSON text
+JSON_COLUMNS = ("metrics", "timings")
+
+
+def encode_cursor(row):
+    return f"{row['created_at']!r}:{row['id']}"
+
+
+def decode_cursor(cursor):
+    """Parse a pagination cursor, raises ValueError if it is malformed"""
+    created_at, row_id = cursor.rsplit(":", 1)
+    return float(created_at), int(row_id)
+
+
+class AnalysisDB:
+    """
+    Embedded SQLite store for analysis history
+    Uses WAL so readers never block the writer, and one connection per thread
+    since the API, the worker pool and asyncio.to_thread all touch it
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+        logger.info(f"Analysis database ready: {path}")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            #WAL makes NORMAL durable against app crashes, only a power cut can lose the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _row_to_dict(self, row):
+        item = dict(row)
+        for column in JSON_COLUMNS:
+            if item.get(column):
+                item[column] = json.loads(item[column])
+        return item
+
+    def record_analysis(self, **fields):
+        """Insert an analysis record, returns its id"""
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown analysis fields: {', '.join(sorted(unknown))}")
+
+        fields.setdefault("created_at", time.time())
+        for column in JSON_COLUMNS:
+            if fields.get(column) is not None:
+                fields[column] = json.dumps(fields[column])
+
+        names = list(fields)
+        cursor = self._connect().execute(
+            f"INSERT INTO analyses ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+            [fields[name] for name in names]
+        )
+        return cursor.lastrowid
+
+    def get_analysis(self, analysis_id):
+        row = self._connect().execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_analyses(self, user_id=None, session_id=None, content_hash=None, limit=20, cursor=None):
+        """
+        Newest first page of analyses, optionally filtered
+        Without user_id the analyses of every user are included
+        Uses keyset pagination on (created_at, id) so every page is an index range
+        scan no matter how deep it is
+        Returns the items and the cursor for the next page (None on the last page)
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses = []
+        params = []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if content_hash is not None:
+            clauses.append("content_hash = ?")
+            params.append(content_hash)
+        if cursor is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM analyses {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        items = [self._row_to_dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def session_aggregates(self, user_id=None, limit=20):
+        """
+        Per-session totals from the SQL rollup, most recent session first
+        Without user_id the sessions of every user are included, like list_analyses
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where = "WHERE user_key = ?" if user_id is not None else ""
+        params = (user_id, limit) if user_id is not None else (limit,)
+        rows = self._connect().execute(
+            f"""
+            SELECT
+                NULLIF(user_key, '') AS user_id,
+                session_id,
+                clips,
+                succeeded,
+                failed,
+                total_frames,
+                frames_with_pose,
+                CAST(frames_with_pose AS REAL) / NULLIF(total_frames, 0) AS detection_rate,
+                total_duration_seconds,
+                total_processing_seconds / NULLIF(processed_clips, 0) AS mean_processing_seconds,
+                started_at,
+                ended_at
+            FROM sessions
+            {where}
+            ORDER BY ended_at DESC
+            LIMIT ?
+            """,
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+#shared database used by the API
+analysis_db = AnalysisDB()
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+import mediapipe as mp
+
+mp_pose = mp.solutions.pose
+
+#number of landmarks in a MediaPipe pose
+NUM_LANDMARKS = 33
+
+#landmarks below this visibility are not drawn
+MIN_VISIBILITY = 0.5
+
+
+def landmarks_to_array(pose_landmarks):
+    """
+    Convert a MediaPipe landmark list to a (33, 4) float32 array
+    Columns are normalized x, y, z and visibility
+    """
+    return np.array(
+        [[lm.x, lm.y, lm.z, lm.visibility] for lm in pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+def draw_landmark_array(frame_bgr, landmarks, color=(0, 255, 0), connection_color=(0, 255, 255), label=None):
+    """
+    Draw a (33, 4) landmark array onto a BGR frame in place
+    Uses the same connections as mp_drawing.draw_landmarks, with an optional label above the head
+    """
+    height, width = frame_bgr.shape[:2]
+    visible = landmarks[:, 3] >= MIN_VISIBILITY
+    points = np.round(np.nan_to_num(landmarks[:, :2]) * (width, height)).astype(np.int32)
+    #opencv wants plain python ints for coordinates
+    point_list = [tuple(point) for point in points.tolist()]
+
+    for start, end in mp_pose.POSE_CONNECTIONS:
+        if visible[start] and visible[end]:
+            cv2.line(frame_bgr, point_list[start], point_list[end], connection_color, 2)
+
+    for idx in np.flatnonzero(visible):
+        cv2.circle(frame_bgr, point_list[idx], 1, color, 1)
+
+    if label and visible.any():
+        top = int(points[visible][:, 1].min())
+        left = int(points[visible][:, 0].min())
+        cv2.putText(frame_bgr, label, (left, max(15, top - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
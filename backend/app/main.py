@@ -1,13 +1,26 @@
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+import json
+import time
+import asyncio
+import functools
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import logging
 import traceback
-import tempfile
+import uuid
+from collections import OrderedDict
 
-from .mediapipe_processor import process_video  # Use the fixed processor
-from .video import save_upload_file, upload_to_supabase, cleanup_temp_files
+from .video import save_upload_file, upload_to_supabase, extract_video_archive, file_sha256
+from .temp_store import temp_store, StoreFileResponse
+from .workers import run_analysis, submit_analysis, MAX_WORKERS
+from .workers import shutdown as shutdown_workers
+from .metrics import summarize_session
+from .smoothing import SMOOTHING_METHODS
+from .streaming import handle_stream
+from .db import analysis_db, LANDMARKS_DIR
+from .video_writers import hls_supported
 
 #set up logging
 logging.basicConfig(
@@ -16,11 +29,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-#define the temporary directory for storing videos
-TEMP_DIR = tempfile.gettempdir()
+#define the temporary directory for storing videos, managed by the temp store
+TEMP_DIR = temp_store.directory
+
+#accepted upload types
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.webm')
+
+#maximum number of players tracked in multi-player mode
+MAX_PLAYERS = 4
+
+#number of finished background jobs remembered for status queries
+MAX_JOBS = 1000
+
+#maximum number of clips accepted in one batch request
+BATCH_MAX_CLIPS = int(os.environ.get("RV_BATCH_MAX_CLIPS", 50))
 
 app = FastAPI()
 
+#background jobs for segmented output, keyed by job id
+jobs = OrderedDict()
+_background_tasks = set()
+
 #add CORS middleware to allow requests from the frontend
 app.add_middleware(
     CORSMiddleware,
@@ -30,18 +59,92 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_temp_store():
+    temp_store.sweep()
+    temp_store.start()
+
+@app.on_event("shutdown")
+async def stop_temp_store():
+    await temp_store.stop()
+    shutdown_workers()
+
 #route for serving video files
 @app.get("/api/video/{filename}")
 async def get_video(filename: str):
     """Serve video files from the temporary directory"""
-    file_path = os.path.join(TEMP_DIR, filename)
+    file_path = temp_store.path_for(filename)
     logger.info(f"Requested video file: {file_path}")
     
-    if not os.path.exists(file_path):
+    #hold a reference while the response streams so the sweeper leaves the file alone
+    if not temp_store.acquire(file_path):
         logger.error(f"Video file not found: {file_path}")
         raise HTTPException(status_code=404, detail="Video not found")
     
-    return FileResponse(file_path, media_type="video/mp4")
+    return StoreFileResponse(file_path, temp_store, media_type="video/mp4")
+
+#route for live analysis of a frame stream
+@app.websocket("/ws/analyze")
+async def stream_analysis(websocket: WebSocket):
+    """Analyze frames streamed from a phone or courtside camera as they arrive"""
+    await handle_stream(websocket)
+
+#route for serving HLS playlists and segments while they are being written
+@app.get("/api/hls/{filename}")
+async def get_hls_file(filename: str):
+    """Serve HLS playlists and segments from the temporary directory"""
+    if filename.endswith(".m3u8"):
+        media_type = "application/vnd.apple.mpegurl"
+    elif filename.endswith(".ts"):
+        media_type = "video/mp2t"
+    else:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    file_path = temp_store.path_for(filename)
+    if not temp_store.acquire(file_path):
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    #the playlist grows while the job runs, players must always refetch it
+    headers = {"Cache-Control": "no-cache"} if media_type != "video/mp2t" else None
+    return StoreFileResponse(file_path, temp_store, media_type=media_type, headers=headers)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background analysis job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/analyses")
+async def list_analyses(
+    user_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Analysis history, newest first, pass next_cursor back as cursor for the next page"""
+    try:
+        items, next_cursor = await asyncio.to_thread(
+            analysis_db.list_analyses, user_id, session_id, content_hash, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/api/analyses/{analysis_id}")
+async def get_analysis(analysis_id: int):
+    """A single analysis record"""
+    analysis = await asyncio.to_thread(analysis_db.get_analysis, analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return analysis
+
+@app.get("/api/sessions")
+async def list_sessions(user_id: Optional[str] = None, limit: int = Query(20, ge=1, le=100)):
+    """Aggregated metrics per session, most recent session first, all users unless user_id is given"""
+    return {"items": await asyncio.to_thread(analysis_db.session_aggregates, user_id, limit)}
 
 @app.get("/")
 def read_root():
@@ -56,20 +159,250 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": f"Internal server error: {str(exc)}"}
     )
 
+def local_video_url(path):
+    """URL of a video served by the /api/video endpoint"""
+    return f"http://localhost:8000/api/video/{os.path.basename(path)}"
+
+def verify_processed_video(processed_path):
+    """Raise a ValueError if the processed video cannot be opened or has no frames"""
+    import cv2
+    cap = cv2.VideoCapture(processed_path)
+    if not cap.isOpened():
+        raise ValueError("Processed video cannot be opened")
+    
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    
+    if frame_count == 0:
+        raise ValueError("Processed video has no frames")
+        
+    logger.info(f"Processed video verified: {frame_count} frames")
+
+def publish_videos(temp_path, processed_path):
+    """
+    Upload the original and processed videos to Supabase
+    Falls back to local URLs when Supabase is not configured or an upload fails
+    Returns the original and processed URLs
+    """
+    #upload both videos to Supabase
+    logger.info("Uploading videos to Supabase")
+    try:
+        #check if environment variables are set
+        if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY"):
+            logger.error("Supabase environment variables not set")
+            logger.info("Using local file paths for testing")
+            
+            #use local paths for testing
+            return local_video_url(temp_path), local_video_url(processed_path)
+        
+        #try uploading to supabase
+        try:
+            original_url = upload_to_supabase(temp_path, "original")
+            logger.info(f"Original URL: {original_url}")
+        except Exception as e:
+            logger.error(f"Error uploading original video: {str(e)}")
+            #fallback to local URL
+            original_url = local_video_url(temp_path)
+            
+        try:
+            processed_url = upload_to_supabase(processed_path, "processed")
+            logger.info(f"Processed URL: {processed_url}")
+        except Exception as e:
+            logger.error(f"Error uploading processed video: {str(e)}")
+            #fallback to local URL
+            processed_url = local_video_url(processed_path)
+        
+        return original_url, processed_url
+    
+    except Exception as e:
+        logger.error(f"Error with Supabase upload: {str(e)}")
+        logger.error(traceback.format_exc())
+        
+        #use local file paths
+        return local_video_url(temp_path), local_video_url(processed_path)
+
+def new_landmarks_path():
+    """Persistent location for a new clip's landmarks file"""
+    return os.path.join(LANDMARKS_DIR, f"{uuid.uuid4().hex}.npz")
+
+def public_metrics(result):
+    """Clip metrics without the server side file paths"""
+    return {key: value for key, value in result.items() if key not in ("output_path", "landmarks_path")}
+
+async def record_analysis(temp_path, filename, options, started, result=None,
+                          original_url=None, processed_url=None, timings=None, detail=None):
+    """
+    Store an analysis in the history database
+    options holds the request's user_id, session_id, players, smoothing and output
+    Recording never fails the request, returns the new id or None
+    """
+    try:
+        content_hash = None
+        if temp_path and os.path.exists(temp_path):
+            content_hash = await asyncio.to_thread(file_sha256, temp_path)
+        
+        metrics = public_metrics(result) if result else {}
+        return await asyncio.to_thread(
+            analysis_db.record_analysis,
+            filename=filename,
+            content_hash=content_hash,
+            status="error" if detail else "done",
+            original_url=original_url,
+            processed_url=processed_url,
+            landmarks_path=result.get("landmarks_path") if result else None,
+            frames=metrics.get("frames_written"),
+            frames_with_pose=metrics.get("frames_with_pose"),
+            detection_rate=metrics.get("detection_rate"),
+            duration_seconds=metrics.get("duration_seconds"),
+            processing_seconds=metrics.get("processing_seconds"),
+            total_seconds=time.perf_counter() - started,
+            metrics=metrics or None,
+            timings=timings,
+            detail=detail,
+            **options
+        )
+    except Exception as e:
+        logger.error(f"Error recording analysis: {str(e)}")
+        return None
+
+def validate_processing_options(players, smoothing):
+    """Raise a 400 for option combinations the processor does not support"""
+    if smoothing is not None and smoothing not in SMOOTHING_METHODS:
+        raise HTTPException(status_code=400, detail=f"Invalid smoothing method. Use one of: {', '.join(SMOOTHING_METHODS)}")
+    if smoothing is not None and players > 1:
+        raise HTTPException(status_code=400, detail="Smoothing is only supported for single player analysis.")
+
+async def run_hls_job(job, temp_path, filename, options, started, ball, timings):
+    """
+    Process an uploaded video in the background while publishing HLS segments
+    The job entry moves from queued to streaming once the first segment can be
+    played, then to done with the final video URLs (or error)
+    timings already holds the upload's save time, the other steps are added here
+    """
+    job_id = job["job_id"]
+    playlist_path = os.path.join(TEMP_DIR, f"{job_id}.m3u8")
+    pinned = [temp_path]
+    processed_path = None
+    
+    def on_hls_update(path):
+        #runs on the worker thread, pin each new file until the job is finished
+        if os.path.abspath(path) in pinned:
+            temp_store.register(path)
+            return
+        pinned.append(temp_store.register(path, pin=True))
+        if path.endswith(".ts"):
+            job["status"] = "streaming"
+            job["segments"] += 1
+    
+    result = None
+    try:
+        step_started = time.perf_counter()
+        result = await run_analysis(
+            temp_path, TEMP_DIR, options["players"], options["smoothing"],
+            hls_playlist=playlist_path, on_hls_update=on_hls_update,
+            landmarks_path=new_landmarks_path(), ball=ball
+        )
+        processed_path = temp_store.register(result["output_path"], pin=True)
+        pinned.append(processed_path)
+        await asyncio.to_thread(verify_processed_video, processed_path)
+        timings["processing_seconds"] = time.perf_counter() - step_started
+        
+        step_started = time.perf_counter()
+        original_url, processed_url = await asyncio.to_thread(publish_videos, temp_path, processed_path)
+        timings["publish_seconds"] = time.perf_counter() - step_started
+        analysis_id = await record_analysis(
+            temp_path, filename, options, started, result, original_url, processed_url, timings
+        )
+        job.update({
+            "status": "done",
+            "analysis_id": analysis_id,
+            "original_url": original_url,
+            "processed_url": processed_url,
+            "metrics": public_metrics(result)
+        })
+        logger.info(f"HLS job {job_id} finished")
+    except Exception as e:
+        logger.error(f"Error in HLS job {job_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        await record_analysis(temp_path, filename, options, started, result, timings=timings, detail=str(e))
+        job.update({"status": "error", "detail": f"Error processing video: {str(e)}"})
+    finally:
+        temp_store.release_all(pinned)
+
+async def start_hls_job(file, options, started, ball):
+    """Save the upload and start processing it in the background, returns the job URLs right away"""
+    try:
+        temp_path = temp_store.register(await save_upload_file(file, TEMP_DIR), pin=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving uploaded file: {str(e)}")
+    timings = {"save_seconds": time.perf_counter() - started}
+    
+    job_id = uuid.uuid4().hex
+    job = jobs[job_id] = {"job_id": job_id, "status": "queued", "segments": 0}
+    #forget the oldest finished jobs, running jobs stay queryable however many there are
+    finished = [old_id for old_id, old_job in jobs.items() if old_job["status"] in ("done", "error")]
+    for old_id in finished[:len(jobs) - MAX_JOBS]:
+        del jobs[old_id]
+    
+    task = asyncio.create_task(run_hls_job(job, temp_path, file.filename, options, started, ball, timings))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    
+    logger.info(f"Started HLS job {job_id} for {file.filename}")
+    return JSONResponse(status_code=202, content={
+        "job_id": job_id,
+        "playlist_url": f"http://localhost:8000/api/hls/{job_id}.m3u8",
+        "status_url": f"http://localhost:8000/api/jobs/{job_id}",
+        "message": "Video processing started"
+    })
+
 @app.post("/analyze")
-async def analyze_video(file: UploadFile = File(...)):
+async def analyze_video(
+    file: UploadFile = File(...),
+    players: int = Query(1, ge=1, le=MAX_PLAYERS),
+    smoothing: Optional[str] = Query(None),
+    output: str = Query("mp4", pattern="^(mp4|hls)$"),
+    ball: bool = Query(False),
+    user_id: Optional[str] = None,
+    session_id: Optional[str] = None
+):
     """
     Upload a video, process it with MediaPipe, and store both videos in Supabase
+    Set players above 1 to track every player in doubles or rally footage
+    Set smoothing to process frames in parallel and smooth the landmarks offline
+    Set output to hls to get a playlist URL right away that grows as segments
+    are processed, the final URLs are then reported by the job status endpoint
+    Set ball to also track the ball and estimate the shot speed at contact
+    Every analysis is recorded in the history database under user_id and session_id
     Returns the URLs to the original and processed videos
     """
+    started = time.perf_counter()
     logger.info(f"Received upload request for file: {file.filename}")
+    validate_processing_options(players, smoothing)
     
     #validate file type
-    if not file.filename.lower().endswith(('.mp4', '.mov', '.avi', '.webm')):
+    if not file.filename.lower().endswith(VIDEO_EXTENSIONS):
         logger.warning(f"Invalid file type: {file.filename}")
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video file.")
     
+    options = {
+        "user_id": user_id,
+        "session_id": session_id,
+        "players": players,
+        "smoothing": smoothing,
+        "output": output
+    }
+    if output == "hls":
+        if not await asyncio.to_thread(hls_supported):
+            raise HTTPException(
+                status_code=400,
+                detail="HLS output needs PyAV with the libx264 encoder, which this server does not have. Use output=mp4."
+            )
+        return await start_hls_job(file, options, started, ball)
+    
     temp_files = []
+    timings = {}
+    result = None
     processed_url = None
     original_url = None
     processed_path = None
@@ -78,80 +411,46 @@ async def analyze_video(file: UploadFile = File(...)):
     try:
         #save the uploaded file
         logger.info("Saving uploaded file")
-        temp_path = await save_upload_file(file)
+        temp_path = temp_store.register(await save_upload_file(file, TEMP_DIR), pin=True)
         temp_files.append(temp_path)
         logger.info(f"Saved uploaded file to: {temp_path}")
+        timings["save_seconds"] = time.perf_counter() - started
         
         #process the video with MediaPipe
         logger.info("Processing video with MediaPipe")
         try:
-            processed_path = process_video(temp_path)
+            step_started = time.perf_counter()
+            result = await run_analysis(
+                temp_path, TEMP_DIR, players, smoothing, landmarks_path=new_landmarks_path(), ball=ball
+            )
+            processed_path = temp_store.register(result["output_path"], pin=True)
             temp_files.append(processed_path)
             logger.info(f"Processed video saved to: {processed_path}")
             
-            # Verify the processed video
-            import cv2
-            cap = cv2.VideoCapture(processed_path)
-            if not cap.isOpened():
-                raise ValueError("Processed video cannot be opened")
-            
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            cap.release()
-            
-            if frame_count == 0:
-                raise ValueError("Processed video has no frames")
-                
-            logger.info(f"Processed video verified: {frame_count} frames")
+            await asyncio.to_thread(verify_processed_video, processed_path)
+            timings["processing_seconds"] = time.perf_counter() - step_started
             
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
             logger.error(traceback.format_exc())
+            await record_analysis(temp_path, file.filename, options, started, result, timings=timings, detail=str(e))
             raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
         
         #upload both videos to Supabase
-        logger.info("Uploading videos to Supabase")
-        try:
-            #check if environment variables are set
-            if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY"):
-                logger.error("Supabase environment variables not set")
-                logger.info("Using local file paths for testing")
-                
-                #use local paths for testing
-                original_url = f"http://localhost:8000/api/video/{os.path.basename(temp_path)}"
-                processed_url = f"http://localhost:8000/api/video/{os.path.basename(processed_path)}"
-            else:
-                #try uploading to supabase
-                try:
-                    original_url = upload_to_supabase(temp_path, "original")
-                    logger.info(f"Original URL: {original_url}")
-                except Exception as e:
-                    logger.error(f"Error uploading original video: {str(e)}")
-                    #fallback to local URL
-                    original_url = f"http://localhost:8000/api/video/{os.path.basename(temp_path)}"
-                    
-                try:
-                    processed_url = upload_to_supabase(processed_path, "processed")
-                    logger.info(f"Processed URL: {processed_url}")
-                except Exception as e:
-                    logger.error(f"Error uploading processed video: {str(e)}")
-                    #fallback to local URL
-                    processed_url = f"http://localhost:8000/api/video/{os.path.basename(processed_path)}"
-                
-        except Exception as e:
-            logger.error(f"Error with Supabase upload: {str(e)}")
-            logger.error(traceback.format_exc())
-            
-            #use local file paths
-            if processed_path and temp_path:
-                processed_url = f"http://localhost:8000/api/video/{os.path.basename(processed_path)}"
-                original_url = f"http://localhost:8000/api/video/{os.path.basename(temp_path)}"
-            else:
-                raise HTTPException(status_code=500, detail=f"Error uploading videos: {str(e)}")
+        step_started = time.perf_counter()
+        original_url, processed_url = await asyncio.to_thread(publish_videos, temp_path, processed_path)
+        timings["publish_seconds"] = time.perf_counter() - step_started
+        
+        analysis_id = await record_analysis(
+            temp_path, file.filename, options, started, result, original_url, processed_url, timings
+        )
         
         #return the URLs
         return JSONResponse({
+            "analysis_id": analysis_id,
             "original_url": original_url,
             "processed_url": processed_url,
+            "ball": result["ball"],
             "message": "Video processed successfully"
         })
     
@@ -162,6 +461,7 @@ async def analyze_video(file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         logger.error(traceback.format_exc())
+        await record_analysis(temp_path, file.filename, options, started, result, timings=timings, detail=str(e))
         
         #try to return something useful for debugging
         response = {
@@ -171,14 +471,187 @@ async def analyze_video(file: UploadFile = File(...)):
         
         #if we got to the point of having processed videos, include their paths
         if processed_path and temp_path:
-            response["processed_url"] = f"http://localhost:8000/api/video/{os.path.basename(processed_path)}"
-            response["original_url"] = f"http://localhost:8000/api/video/{os.path.basename(temp_path)}"
+            response["processed_url"] = local_video_url(processed_path)
+            response["original_url"] = local_video_url(temp_path)
             
         return JSONResponse(status_code=500, content=response)
     
     finally:
-        # For debugging, don't clean up files immediately
-        # This allows us to access them through the /api/video endpoint
-        logger.info(f"Keeping temporary files for serving: {temp_files}")
-        # In production, you'd want to clean these up after a certain time
-        # cleanup_temp_files(temp_files)
\ No newline at end of file
+        # Files stay available through the /api/video endpoint until the
+        # temp store expires or evicts them, we only drop our references here
+        logger.info(f"Releasing temporary files to the temp store: {temp_files}")
+        temp_store.release_all(temp_files)
+
+
+def abandon_clip(temp_path, future):
+    """
+    Done callback for a batch clip whose client disconnected, runs on the worker thread
+    The processed video goes to the temp store unpinned so it expires normally, the
+    landmarks file is deleted because no analysis record points to it
+    """
+    try:
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            temp_store.register(result["output_path"])
+            if result.get("landmarks_path") and os.path.exists(result["landmarks_path"]):
+                os.unlink(result["landmarks_path"])
+    except Exception as e:
+        logger.error(f"Error cleaning up abandoned clip {temp_path}: {str(e)}")
+    finally:
+        temp_store.release(temp_path)
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    players: int = Query(1, ge=1, le=MAX_PLAYERS),
+    smoothing: Optional[str] = Query(None),
+    ball: bool = Query(False),
+    user_id: Optional[str] = None,
+    session_id: Optional[str] = None
+):
+    """
+    Upload all clips from a session (as videos or zip archives of videos) and
+    process them on the worker pool, which keeps pose models loaded between clips
+    Streams newline-delimited JSON, one line per clip as it completes, followed
+    by a line with the aggregated session metrics
+    Clips are recorded in the history database under session_id, a new session
+    is started when none is given
+    """
+    logger.info(f"Received batch upload request with {len(files)} files")
+    validate_processing_options(players, smoothing)
+    
+    for file in files:
+        if not file.filename.lower().endswith(VIDEO_EXTENSIONS + ('.zip',)):
+            logger.warning(f"Invalid file type in batch: {file.filename}")
+            raise HTTPException(status_code=400, detail=f"Invalid file type: {file.filename}. Please upload video files or a zip archive.")
+    
+    #save every clip before streaming starts, the uploads are closed once the handler returns
+    clips = []
+    temp_files = []
+    #clips from one archive share its save and extraction time
+    save_seconds = {}
+    try:
+        for file in files:
+            save_started = time.perf_counter()
+            saved_path = await save_upload_file(file, TEMP_DIR)
+            if not file.filename.lower().endswith('.zip'):
+                temp_files.append(temp_store.register(saved_path, pin=True))
+                clips.append((file.filename, temp_files[-1]))
+                save_seconds[temp_files[-1]] = time.perf_counter() - save_started
+                continue
+            
+            try:
+                members = await asyncio.to_thread(
+                    extract_video_archive, saved_path, TEMP_DIR, VIDEO_EXTENSIONS, BATCH_MAX_CLIPS, temp_store.max_bytes
+                )
+            finally:
+                os.unlink(saved_path)
+            for member_name, member_path in members:
+                temp_files.append(temp_store.register(member_path, pin=True))
+                clips.append((member_name, temp_files[-1]))
+                save_seconds[temp_files[-1]] = time.perf_counter() - save_started
+            
+            if len(clips) > BATCH_MAX_CLIPS:
+                break
+    except Exception as e:
+        temp_store.release_all(temp_files)
+        logger.error(f"Error saving batch upload: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Error reading uploaded files: {str(e)}")
+    
+    if not clips:
+        temp_store.release_all(temp_files)
+        raise HTTPException(status_code=400, detail="No video files found in the upload.")
+    if len(clips) > BATCH_MAX_CLIPS:
+        temp_store.release_all(temp_files)
+        raise HTTPException(status_code=400, detail=f"Too many clips, the limit is {BATCH_MAX_CLIPS} per batch.")
+    
+    logger.info(f"Scheduling {len(clips)} clips across {MAX_WORKERS} workers")
+    options = {
+        "user_id": user_id,
+        "session_id": session_id or uuid.uuid4().hex,
+        "players": players,
+        "smoothing": smoothing,
+        "output": "mp4"
+    }
+    
+    #worker pool futures by clip index until their result is picked up, they
+    #outlive the tasks if the client disconnects
+    submitted = {}
+    
+    async def analyze_one(index, filename, temp_path):
+        clip_started = time.perf_counter()
+        timings = {"save_seconds": save_seconds[temp_path]}
+        result = None
+        try:
+            submitted[index] = submit_analysis(
+                temp_path, TEMP_DIR, players, smoothing, landmarks_path=new_landmarks_path(), ball=ball
+            )
+            result = await asyncio.wrap_future(submitted[index])
+            del submitted[index]
+            processed_path = temp_store.register(result["output_path"], pin=True)
+            temp_files.append(processed_path)
+            await asyncio.to_thread(verify_processed_video, processed_path)
+            #includes the wait for a free worker, like the single upload path
+            timings["processing_seconds"] = time.perf_counter() - clip_started
+            
+            step_started = time.perf_counter()
+            original_url, processed_url = await asyncio.to_thread(publish_videos, temp_path, processed_path)
+            timings["publish_seconds"] = time.perf_counter() - step_started
+            analysis_id = await record_analysis(
+                temp_path, filename, options, clip_started, result, original_url, processed_url, timings
+            )
+            return {
+                "type": "clip",
+                "index": index,
+                "filename": filename,
+                "status": "ok",
+                "analysis_id": analysis_id,
+                "original_url": original_url,
+                "processed_url": processed_url,
+                "metrics": public_metrics(result)
+            }
+        except Exception as e:
+            logger.error(f"Error processing batch clip {filename}: {str(e)}")
+            logger.error(traceback.format_exc())
+            analysis_id = await record_analysis(
+                temp_path, filename, options, clip_started, result, timings=timings, detail=str(e)
+            )
+            return {
+                "type": "clip",
+                "index": index,
+                "filename": filename,
+                "status": "error",
+                "analysis_id": analysis_id,
+                "detail": f"Error processing video: {str(e)}"
+            }
+    
+    async def stream_results():
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(analyze_one(i, name, path)) for i, (name, path) in enumerate(clips)]
+        results = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                results.append(result)
+                logger.info(f"Batch clip {result['index'] + 1}/{len(clips)} finished: {result['status']}")
+                yield json.dumps(result) + "\n"
+            
+            yield json.dumps({
+                "type": "session",
+                "session_id": options["session_id"],
+                "metrics": summarize_session(results, time.perf_counter() - started)
+            }) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            #clips that already started on the worker pool keep their input pinned until
+            #the thread finishes, their outputs are then left to the temp store to expire
+            running = set()
+            for index, future in submitted.items():
+                if not future.cancel():
+                    running.add(clips[index][1])
+                    future.add_done_callback(functools.partial(abandon_clip, clips[index][1]))
+            temp_store.release_all(path for path in temp_files if path not in running)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
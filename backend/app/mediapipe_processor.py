@@ -3,11 +3,22 @@ import mediapipe as mp
 import numpy as np
 import tempfile
 import os
+import time
 import uuid
 import platform
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from contextlib import contextmanager, nullcontext
 import logging
 
+from .landmarks import draw_landmark_array, landmarks_to_array, NUM_LANDMARKS, MIN_VISIBILITY
+from .multi_player import MultiPlayerTracker, track_color
+from .smoothing import smooth_landmarks, SMOOTHING_METHODS
+from .video_writers import open_video_writer, HlsWriter
+from .ball_tracking import BallTracker, draw_ball, estimate_shot
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,17 +28,173 @@ mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 
-def process_video(video_path):
+# Threads shared by all clips for per-frame inference in offline smoothing mode
+INFERENCE_THREADS = int(os.environ.get("RV_INFERENCE_THREADS", os.cpu_count() or 2))
+_inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="rv-inference")
+_inference_local = threading.local()
+
+def create_pose(static_image_mode=False):
+    """Create a MediaPipe pose model with the settings used for video processing"""
+    return mp_pose.Pose(
+        static_image_mode=static_image_mode,
+        model_complexity=0,  # Lite model for speed
+        smooth_landmarks=True,
+        enable_segmentation=False,  # Disable segmentation for speed
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5)
+
+@contextmanager
+def _pose_session(pose=None):
+    """
+    Yield a pose model for one clip
+    A warm model passed in is reset so no tracking state leaks between clips,
+    otherwise a new model is created and closed afterwards
+    """
+    if pose is not None:
+        pose.reset()
+        yield pose
+        return
+    
+    pose = create_pose()
+    try:
+        yield pose
+    finally:
+        pose.close()
+
+@contextmanager
+def _tracker_session(tracker=None, players=2):
+    """
+    Yield a multi-player tracker for one clip
+    A warm tracker passed in is reset and keeps its pooled pose models,
+    otherwise a new tracker is created and closed afterwards
+    """
+    if tracker is not None:
+        tracker.reset()
+        tracker.max_players = players
+        yield tracker
+        return
+    
+    with MultiPlayerTracker(create_pose, max_players=players) as tracker:
+        yield tracker
+
+def _static_inference(frame_rgb):
+    """Run pose on a single frame with this thread's static image model"""
+    pose = getattr(_inference_local, "pose", None)
+    if pose is None:
+        pose = create_pose(static_image_mode=True)
+        _inference_local.pose = pose
+    
+    results = pose.process(frame_rgb)
+    if not results.pose_landmarks:
+        return np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    return landmarks_to_array(results.pose_landmarks)
+
+def _infer_landmarks_parallel(video_path, frame_skip, size):
+    """
+    Decode a video and run static image pose inference on every kept frame in parallel
+    Frames are independent so they spread across the inference threads, with a
+    bounded number in flight to cap memory use
+    Returns a (frames, 33, 4) landmark array with NaN rows where no pose was found
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    
+    max_in_flight = INFERENCE_THREADS * 4
+    pending = deque()
+    landmarks = []
+    frame_idx = 0
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            if frame_idx % frame_skip == 0:
+                frame_resized = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+                frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
+                frame_rgb.flags.writeable = False
+                pending.append(_inference_executor.submit(_static_inference, frame_rgb))
+                if len(pending) >= max_in_flight:
+                    landmarks.append(pending.popleft().result())
+            frame_idx += 1
+        
+        while pending:
+            landmarks.append(pending.popleft().result())
+    finally:
+        for future in pending:
+            future.cancel()
+        cap.release()
+    
+    if not landmarks:
+        return np.empty((0, NUM_LANDMARKS, 4), dtype=np.float32)
+    return np.stack(landmarks)
+
+def save_landmarks(path, arrays, fps):
+    """
+    Save per-frame landmark arrays to a compressed .npz file
+    Single player clips have one (frames, 33, 4) "landmarks" array, multi-player
+    clips have one "player_<track id>" array each, with NaN where a player was not seen
+    Clips analyzed with ball tracking also have a (frames, 2) "ball" array
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez_compressed(path, fps=np.float32(fps), **arrays)
+    logger.info(f"Saved landmarks to: {path}")
+
+def load_landmarks(path):
+    """Load a landmarks file written by save_landmarks, returns (arrays dict, fps)"""
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files if key != "fps"}
+        return arrays, float(data["fps"])
+
+def _draw_frame_info(frame_bgr, frame_number):
+    """Add the frame info overlay"""
+    cv2.putText(
+        frame_bgr,
+        f"Frame: {frame_number}",
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.7,
+        (255, 255, 255),
+        2
+    )
+
+def process_video(video_path, output_dir=None, pose=None, players=1, smoothing=None):
     """
     Process a video with MediaPipe pose detection
     Optimized for Supabase upload limits and web compatibility
+    The output is written to output_dir, or the system temp directory if not given
     Returns the path to the processed video
     """
+    return analyze_clip(video_path, output_dir, pose, players, smoothing=smoothing)["output_path"]
+
+def analyze_clip(video_path, output_dir=None, pose=None, players=1, tracker=None, smoothing=None,
+                 hls_playlist=None, on_hls_update=None, landmarks_path=None, ball=False):
+    """
+    Process a video with MediaPipe pose detection and collect clip metrics
+    An already loaded pose model (or multi-player tracker) can be passed in to skip model setup
+    With players > 1 each player is tracked separately with a stable id,
+    for doubles and rally footage
+    With smoothing set to one of SMOOTHING_METHODS, frames are processed independently
+    in parallel and the whole trajectory is smoothed offline before drawing
+    With hls_playlist set, processed frames are also written as HLS segments and
+    on_hls_update is called for every segment and playlist file written
+    With landmarks_path set, the per-frame landmarks are saved there with save_landmarks
+    With ball set, the ball is tracked on the same decoded frames and the shot
+    speed at contact is estimated from its trajectory and the pose
+    Returns a dict with the processed video path and the clip metrics
+    """
+    hls = None
+    if smoothing is not None and smoothing not in SMOOTHING_METHODS:
+        raise ValueError(f"Unknown smoothing method: {smoothing}")
+    if smoothing is not None and players > 1:
+        raise ValueError("Offline smoothing is only supported for single player analysis")
+    
     try:
         logger.info(f"Processing video: {video_path}")
+        start_time = time.perf_counter()
         
         # Create a temporary output file
-        output_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        output_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False, dir=output_dir)
         output_path = output_file.name
         output_file.close()
         
@@ -64,39 +231,41 @@ def process_video(video_path):
         logger.info(f"Output: {new_width}x{new_height} at {target_fps} fps")
         
         # Try different codecs for best compatibility
-        codec_options = [
-            ('avc1', cv2.VideoWriter_fourcc(*'avc1')),  # H.264 - best for web
-            ('H264', cv2.VideoWriter_fourcc(*'H264')),  # Alternative H.264
-            ('mp4v', cv2.VideoWriter_fourcc(*'mp4v')),  # Fallback
-        ]
-        
-        fourcc = None
-        out = None
-        
-        # Try codecs until we find one that works
-        for codec_name, codec_fourcc in codec_options:
-            fourcc = codec_fourcc
-            out = cv2.VideoWriter(output_path, fourcc, target_fps, (new_width, new_height))
-            if out.isOpened():
-                logger.info(f"Using codec: {codec_name}")
-                break
-            out.release()
+        out, codec_name = open_video_writer(output_path, target_fps, (new_width, new_height))
+        logger.info(f"Using codec: {codec_name}")
         
-        if not out or not out.isOpened():
-            raise ValueError("Could not create output video file with any codec")
-        
-        # Initialize MediaPipe pose with optimized settings
-        with mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=0,  # Lite model for speed
-            smooth_landmarks=True,
-            enable_segmentation=False,  # Disable segmentation for speed
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5) as pose:
+        # Segmented output grows while we process so playback can start early
+        if hls_playlist:
+            hls = HlsWriter(hls_playlist, target_fps, (new_width, new_height), on_update=on_hls_update)
+        
+        frame_skip = int(original_fps / target_fps) if original_fps > target_fps else 1
+        
+        # Offline smoothing runs inference up front, the drawing pass below only renders
+        smoothed = None
+        if smoothing is not None:
+            inference_start = time.perf_counter()
+            raw_landmarks = _infer_landmarks_parallel(video_path, frame_skip, (new_width, new_height))
+            smoothed = smooth_landmarks(raw_landmarks, target_fps, method=smoothing)
+            logger.info(f"Parallel inference and {smoothing} smoothing of {len(smoothed)} frames took {time.perf_counter() - inference_start:.2f}s")
+        
+        # Initialize MediaPipe pose with optimized settings, one model per player in multi-player mode
+        if smoothed is not None:
+            session = nullcontext()
+        elif players > 1:
+            session = _tracker_session(tracker, players)
+        else:
+            session = _pose_session(pose)
+        with session as model:
             
             frame_idx = 0
             frames_written = 0
-            frame_skip = int(original_fps / target_fps) if original_fps > target_fps else 1
+            frames_with_pose = 0
+            
+            # Per-frame landmarks, kept for saving
+            frame_landmarks = []
+            player_landmarks = {}
+            empty_landmarks = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+            ball_tracker = BallTracker() if ball else None
             
             while cap.isOpened():
                 success, frame = cap.read()
@@ -111,19 +280,52 @@ def process_video(video_path):
                 # Resize frame
                 frame_resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
                 
+                # Track the ball on the frame decoded for pose, before anything is drawn on it
+                if ball_tracker is not None:
+                    ball_tracker.update(frame_resized)
+                
                 # Convert BGR to RGB for MediaPipe processing
                 frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
                 
                 # To improve performance, mark the image as not writeable
                 frame_rgb.flags.writeable = False
-                results = pose.process(frame_rgb)
+                if smoothed is not None:
+                    landmarks = smoothed[frames_written] if frames_written < len(smoothed) else None
+                elif players > 1:
+                    tracked = model.process(frame_rgb)
+                else:
+                    results = model.process(frame_rgb)
+                    frame_landmarks.append(
+                        landmarks_to_array(results.pose_landmarks) if results.pose_landmarks else empty_landmarks
+                    )
                 
                 # Convert back to BGR for OpenCV and make writeable
                 frame_rgb.flags.writeable = True
                 frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
                 
+                # Draw the precomputed smoothed landmarks
+                if smoothed is not None:
+                    if landmarks is not None and (landmarks[:, 3] >= MIN_VISIBILITY).any():
+                        frames_with_pose += 1
+                        draw_landmark_array(frame_bgr, landmarks)
+                        _draw_frame_info(frame_bgr, frames_written)
+                
+                # Draw each tracked player with its own color and id
+                elif players > 1:
+                    found = [(track_id, landmarks) for track_id, landmarks in tracked if landmarks is not None]
+                    for track_id, landmarks in found:
+                        player_landmarks.setdefault(track_id, {})[frames_written] = landmarks
+                    if found:
+                        frames_with_pose += 1
+                        for track_id, landmarks in found:
+                            color = track_color(track_id)
+                            draw_landmark_array(frame_bgr, landmarks, color, color, label=f"P{track_id}")
+                        _draw_frame_info(frame_bgr, frames_written)
+                
                 # Draw pose landmarks
-                if results.pose_landmarks:
+                elif results.pose_landmarks:
+                    frames_with_pose += 1
+                    
                     # Draw landmarks with custom styling
                     mp_drawing.draw_landmarks(
                         frame_bgr,
@@ -141,19 +343,15 @@ def process_video(video_path):
                         )
                     )
                     
-                    # Add frame info overlay
-                    cv2.putText(
-                        frame_bgr,
-                        f"Frame: {frames_written}",
-                        (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7,
-                        (255, 255, 255),
-                        2
-                    )
+                    _draw_frame_info(frame_bgr, frames_written)
+                
+                if ball_tracker is not None:
+                    draw_ball(frame_bgr, ball_tracker.filtered[-8:])
                 
                 # Write the processed frame
                 out.write(frame_bgr)
+                if hls is not None:
+                    hls.write(frame_bgr)
                 frames_written += 1
                 frame_idx += 1
                 
@@ -162,9 +360,14 @@ def process_video(video_path):
                     progress = (frame_idx / frame_count) * 100
                     logger.info(f"Processing: {progress:.1f}% ({frames_written} frames written)")
         
+            # Frames each player was tracked for, keyed by track id
+            player_frames = dict(model.track_frames) if players > 1 else {}
+        
         # Release resources
         cap.release()
         out.release()
+        if hls is not None:
+            hls.close()
         cv2.destroyAllWindows()
         
         # Verify output file
@@ -177,6 +380,32 @@ def process_video(video_path):
         
         output_size_mb = output_size / (1024 * 1024)
         
+        shot = None
+        if landmarks_path or ball_tracker is not None:
+            if smoothed is not None:
+                arrays = {"landmarks": smoothed[:frames_written]}
+            elif players > 1:
+                arrays = {}
+                for track_id, by_frame in player_landmarks.items():
+                    track = np.full((frames_written, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+                    track[list(by_frame)] = np.stack(list(by_frame.values()))
+                    arrays[f"player_{track_id}"] = track
+            else:
+                arrays = {"landmarks": np.stack(frame_landmarks) if frame_landmarks else np.empty((0, NUM_LANDMARKS, 4), dtype=np.float32)}
+            
+            if ball_tracker is not None:
+                # (frames, players, 33, 4), any player can be the one hitting
+                pose_stack = (
+                    np.stack(list(arrays.values()), axis=1) if arrays
+                    else np.empty((frames_written, 0, NUM_LANDMARKS, 4), dtype=np.float32)
+                )
+                shot = estimate_shot(ball_tracker.measurements(), pose_stack, target_fps, aspect=new_width / new_height)
+                arrays["ball"] = ball_tracker.trajectory()
+                logger.info(f"Ball tracked in {shot['frames_tracked']} frames, shot speed {shot['shot_speed_kmh']} km/h")
+            
+            if landmarks_path:
+                save_landmarks(landmarks_path, arrays, target_fps)
+        
         # Verify the output video can be opened
         test_cap = cv2.VideoCapture(output_path)
         if not test_cap.isOpened():
@@ -192,7 +421,23 @@ def process_video(video_path):
             logger.warning(f"File size {output_size_mb:.2f} MB may be too large for Supabase free tier")
             # You could implement additional compression here if needed
         
-        return output_path
+        return {
+            "output_path": output_path,
+            "width": new_width,
+            "height": new_height,
+            "fps": target_fps,
+            "frames_written": frames_written,
+            "frames_with_pose": frames_with_pose,
+            "players": players,
+            "smoothing": smoothing,
+            "detection_rate": frames_with_pose / frames_written if frames_written else 0.0,
+            "duration_seconds": frames_written / target_fps if target_fps else 0.0,
+            "output_size_mb": output_size_mb,
+            "processing_seconds": time.perf_counter() - start_time,
+            "player_frames": {str(k): v for k, v in player_frames.items()},
+            "landmarks_path": landmarks_path,
+            "ball": shot,
+        }
         
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
@@ -201,6 +446,8 @@ def process_video(video_path):
             out.release()
         if 'cap' in locals() and cap:
             cap.release()
+        if hls is not None:
+            hls.abort()
         if 'output_path' in locals() and os.path.exists(output_path):
             try:
                 os.remove(output_path)
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+def summarize_session(clip_results, wall_seconds):
+    """
+    Aggregate per-clip results from a batch into session metrics
+    Frame based rates are weighted by the number of frames in each clip
+    """
+    succeeded = [r["metrics"] for r in clip_results if r.get("status") == "ok"]
+    total_frames = sum(m["frames_written"] for m in succeeded)
+    frames_with_pose = sum(m["frames_with_pose"] for m in succeeded)
+    total_duration = sum(m["duration_seconds"] for m in succeeded)
+    processing_seconds = sum(m["processing_seconds"] for m in succeeded)
+
+    return {
+        "clips": len(clip_results),
+        "succeeded": len(succeeded),
+        "failed": len(clip_results) - len(succeeded),
+        "total_frames": total_frames,
+        "frames_with_pose": frames_with_pose,
+        "detection_rate": frames_with_pose / total_frames if total_frames else 0.0,
+        "total_duration_seconds": total_duration,
+        "processing_seconds": processing_seconds,
+        "mean_processing_seconds": processing_seconds / len(succeeded) if succeeded else 0.0,
+        "wall_seconds": wall_seconds,
+        #seconds of footage analyzed per second of wall time
+        "realtime_factor": total_duration / wall_seconds if wall_seconds else 0.0,
+    }
+
+
+#landmark index triples (a, b, c) for the angle at b
+JOINT_ANGLES = {
+    "left_elbow": (11, 13, 15),
+    "right_elbow": (12, 14, 16),
+    "left_shoulder": (13, 11, 23),
+    "right_shoulder": (14, 12, 24),
+    "left_knee": (23, 25, 27),
+    "right_knee": (24, 26, 28),
+}
+
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+
+
+def to_pixels(landmarks, aspect):
+    """Scale normalized x by the frame aspect ratio so x and y share units and angles and distances are not distorted"""
+    return landmarks[..., :2] * np.array([aspect, 1.0])
+
+
+def joint_angles(landmarks, aspect=1.0):
+    """
+    Joint angles in degrees from (..., 33, 4) landmark arrays
+    Works on a single frame or a whole clip at once, NaN where a landmark is missing
+    aspect is the frame width divided by its height
+    """
+    points = to_pixels(landmarks, aspect)
+    angles = {}
+    for name, (a, b, c) in JOINT_ANGLES.items():
+        ba = points[..., a, :] - points[..., b, :]
+        bc = points[..., c, :] - points[..., b, :]
+        with np.errstate(all="ignore"):
+            cosine = (ba * bc).sum(axis=-1) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1))
+        angles[name] = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+    #rotation of the shoulder line relative to the hip line
+    shoulders = points[..., RIGHT_SHOULDER, :] - points[..., LEFT_SHOULDER, :]
+    hips = points[..., RIGHT_HIP, :] - points[..., LEFT_HIP, :]
+    separation = np.degrees(
+        np.arctan2(shoulders[..., 1], shoulders[..., 0]) - np.arctan2(hips[..., 1], hips[..., 0])
+    )
+    angles["shoulder_hip_separation"] = (separation + 180.0) % 360.0 - 180.0
+    return angles
+
+
+def torso_length(landmarks, aspect=1.0):
+    """Distance between the shoulder and hip midpoints, used as a body scale"""
+    points = to_pixels(landmarks, aspect)
+    shoulder_mid = (points[..., LEFT_SHOULDER, :] + points[..., RIGHT_SHOULDER, :]) / 2
+    hip_mid = (points[..., LEFT_HIP, :] + points[..., RIGHT_HIP, :]) / 2
+    return np.linalg.norm(shoulder_mid - hip_mid, axis=-1)
+
+
+def live_metrics(landmarks, prev_landmarks=None, dt=None, aspect=1.0):
+    """
+    Per-frame metrics for live feedback
+    Joint angles plus wrist speeds in torso lengths per second, so speeds do not
+    depend on how far the player is from the camera
+    Returns a JSON friendly dict, missing values are None
+    """
+    metrics = {name: float(value) for name, value in joint_angles(landmarks, aspect).items()}
+
+    if prev_landmarks is not None and dt:
+        scale = torso_length(landmarks, aspect)
+        points = to_pixels(landmarks, aspect)
+        prev_points = to_pixels(prev_landmarks, aspect)
+        for name, idx in (("left_wrist_speed", LEFT_WRIST), ("right_wrist_speed", RIGHT_WRIST)):
+            with np.errstate(all="ignore"):
+                metrics[name] = float(np.linalg.norm(points[idx] - prev_points[idx]) / dt / scale)
+
+    return {name: (None if not np.isfinite(value) else round(value, 2)) for name, value in metrics.items()}
@@ -0,0 +1,244 @@
+import cv2
+import numpy as np
+import logging
+
+from .landmarks import landmarks_to_array, MIN_VISIBILITY
+
+#set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+#drawing colors for track ids (BGR)
+TRACK_COLORS = [(0, 255, 0), (255, 128, 0), (255, 0, 255), (0, 128, 255)]
+
+
+def track_color(track_id):
+    return TRACK_COLORS[(track_id - 1) % len(TRACK_COLORS)]
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes"""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+class PersonDetector:
+    """
+    Cheap person detector using OpenCV's built-in HOG people detector
+    Needs no model download, it only has to find players every few frames
+    since the per-player pose models follow them in between
+    """
+
+    def __init__(self, detect_width=640, min_score=0.3, nms_threshold=0.4):
+        self.detect_width = detect_width
+        self.min_score = min_score
+        self.nms_threshold = nms_threshold
+        self._hog = cv2.HOGDescriptor()
+        self._hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, frame):
+        """Returns an (N, 4) array of x1, y1, x2, y2 boxes in frame pixels and their (N,) scores"""
+        scale = min(1.0, self.detect_width / frame.shape[1])
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+
+        rects, weights = self._hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(rects) == 0:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        weights = np.asarray(weights, dtype=np.float32).reshape(-1)
+        keep = cv2.dnn.NMSBoxes(rects.tolist(), weights.tolist(), self.min_score, self.nms_threshold)
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+
+        boxes = rects[keep].astype(np.float32) / scale
+        boxes[:, 2:] += boxes[:, :2]
+        return boxes, weights[keep]
+
+
+class _Track:
+    __slots__ = ("id", "box", "pose", "lost", "frames", "landmarks")
+
+    def __init__(self, track_id, box, pose):
+        self.id = track_id
+        self.box = box
+        self.pose = pose
+        self.lost = 0
+        self.frames = 0
+        self.landmarks = None
+
+
+class MultiPlayerTracker:
+    """
+    Track several players in one pass over a video
+    A person detector runs every few frames to find players, each player gets
+    its own pose model running on a crop around them, and detections are matched
+    to existing tracks by IoU so track ids stay stable across frames
+    Pose models are pooled and reused when tracks come and go
+    """
+
+    def __init__(self, pose_factory, max_players=2, detect_every=6, iou_threshold=0.3,
+                 max_lost=12, crop_margin=0.2, box_smoothing=0.6, detector=None):
+        self.pose_factory = pose_factory
+        self.max_players = max_players
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.max_lost = max_lost
+        self.crop_margin = crop_margin
+        self.box_smoothing = box_smoothing
+        self.detector = detector or PersonDetector()
+
+        self._tracks = []
+        self._free_poses = []
+        self._next_id = 1
+        self._frame_idx = 0
+        #frames tracked per track id, including tracks that have ended
+        self.track_frames = {}
+
+    def reset(self):
+        """Drop all tracks so the tracker can be reused for another clip"""
+        for track in self._tracks:
+            self._release_pose(track.pose)
+        self._tracks = []
+        self._next_id = 1
+        self._frame_idx = 0
+        self.track_frames = {}
+
+    def close(self):
+        self.reset()
+        for pose in self._free_poses:
+            pose.close()
+        self._free_poses = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _take_pose(self):
+        if self._free_poses:
+            return self._free_poses.pop()
+        logger.info("Loading pose model for a new player track")
+        return self.pose_factory()
+
+    def _release_pose(self, pose):
+        pose.reset()
+        self._free_poses.append(pose)
+
+    def process(self, frame_rgb):
+        """
+        Run detection, association and per-player pose estimation on one RGB frame
+        Returns a list of (track_id, landmarks) for the active tracks, where landmarks
+        is a (33, 4) array normalized to the full frame or None if the pose was lost
+        """
+        height, width = frame_rgb.shape[:2]
+
+        if self._frame_idx % self.detect_every == 0:
+            boxes, scores = self.detector.detect(frame_rgb)
+            self._associate(boxes, scores)
+
+        for track in self._tracks:
+            track.landmarks = self._estimate_pose(frame_rgb, track, width, height)
+            if track.landmarks is None:
+                track.lost += 1
+                continue
+
+            track.lost = 0
+            track.frames += 1
+            self.track_frames[track.id] = track.frames
+            box = self._landmark_box(track.landmarks, width, height)
+            if box is not None:
+                track.box = self.box_smoothing * box + (1 - self.box_smoothing) * track.box
+
+        self._prune()
+        self._frame_idx += 1
+        return [(track.id, track.landmarks) for track in self._tracks]
+
+    def _associate(self, boxes, scores):
+        """Greedily match detections to tracks by IoU and start tracks for new players"""
+        matched_detections = set()
+
+        if self._tracks and len(boxes):
+            ious = iou_matrix(np.stack([track.box for track in self._tracks]), boxes)
+            matched_tracks = set()
+            #best pairs first
+            for flat_idx in np.argsort(ious, axis=None)[::-1]:
+                track_idx, det_idx = np.unravel_index(flat_idx, ious.shape)
+                if ious[track_idx, det_idx] < self.iou_threshold:
+                    break
+                if track_idx in matched_tracks or det_idx in matched_detections:
+                    continue
+                matched_tracks.add(track_idx)
+                matched_detections.add(det_idx)
+                self._tracks[track_idx].box = boxes[det_idx]
+
+        for det_idx in np.argsort(scores)[::-1]:
+            if len(self._tracks) >= self.max_players:
+                break
+            if det_idx in matched_detections:
+                continue
+            track = _Track(self._next_id, boxes[det_idx], self._take_pose())
+            self._next_id += 1
+            self._tracks.append(track)
+            logger.info(f"Started player track {track.id}")
+
+    def _estimate_pose(self, frame_rgb, track, width, height):
+        x1, y1, x2, y2 = track.box
+        margin_x = (x2 - x1) * self.crop_margin
+        margin_y = (y2 - y1) * self.crop_margin
+        cx1 = int(max(0, x1 - margin_x))
+        cy1 = int(max(0, y1 - margin_y))
+        cx2 = int(min(width, x2 + margin_x))
+        cy2 = int(min(height, y2 + margin_y))
+        if cx2 - cx1 < 16 or cy2 - cy1 < 16:
+            return None
+
+        crop = np.ascontiguousarray(frame_rgb[cy1:cy2, cx1:cx2])
+        crop.flags.writeable = False
+        results = track.pose.process(crop)
+        if not results.pose_landmarks:
+            return None
+
+        #map crop-normalized coordinates back to the full frame
+        landmarks = landmarks_to_array(results.pose_landmarks)
+        crop_w = cx2 - cx1
+        crop_h = cy2 - cy1
+        landmarks[:, 0] = (cx1 + landmarks[:, 0] * crop_w) / width
+        landmarks[:, 1] = (cy1 + landmarks[:, 1] * crop_h) / height
+        landmarks[:, 2] *= crop_w / width
+        return landmarks
+
+    def _landmark_box(self, landmarks, width, height):
+        visible = landmarks[:, 3] >= MIN_VISIBILITY
+        if visible.sum() < 4:
+            return None
+        points = landmarks[visible, :2] * (width, height)
+        x1, y1 = points.min(axis=0)
+        x2, y2 = points.max(axis=0)
+        #landmarks stop at the joints, pad so the box covers the whole body
+        pad_x = (x2 - x1) * 0.1
+        pad_y = (y2 - y1) * 0.1
+        return np.array([x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y], dtype=np.float32)
+
+    def _prune(self):
+        """End tracks that have been lost too long or collapsed onto another player"""
+        keep = []
+        for track in self._tracks:
+            if track.lost > self.max_lost:
+                logger.info(f"Ended player track {track.id}")
+                self._release_pose(track.pose)
+                continue
+            #two tracks on the same person, keep the older one
+            if keep:
+                overlap = iou_matrix(track.box[None], np.stack([other.box for other in keep]))
+                if overlap.max() > 0.6:
+                    logger.info(f"Merged duplicate player track {track.id}")
+                    self._release_pose(track.pose)
+                    continue
+            keep.append(track)
+        self._tracks = keep
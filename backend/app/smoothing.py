@@ -0,0 +1,176 @@
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import savgol_filter
+
+from .landmarks import MIN_VISIBILITY
+
+#smoothing methods accepted by smooth_landmarks
+SMOOTHING_METHODS = ("savgol", "one_euro")
+
+
+def reject_outliers(landmarks, min_visibility=MIN_VISIBILITY, window=5, threshold=4.0):
+    """
+    Mark unreliable landmark positions as missing (NaN)
+    A point is rejected when its visibility is low, or when it jumps away from
+    the rolling median of its neighbours by more than threshold times the
+    median absolute deviation of that landmark over the clip
+    The threshold is scaled by the point's visibility, so a barely visible point
+    is rejected after a smaller jump than a fully visible one
+    landmarks is a (frames, 33, 4) array of x, y, z, visibility
+    Returns a copy of the (frames, 33, 3) positions with rejected points set to NaN
+    """
+    positions = landmarks[..., :3].astype(np.float64, copy=True)
+    positions[landmarks[..., 3] < min_visibility] = np.nan
+
+    if len(positions) < window:
+        return positions
+
+    #rolling median over time for every landmark and coordinate at once
+    pad = window // 2
+    padded = np.pad(positions, ((pad, pad), (0, 0), (0, 0)), mode="edge")
+    windows = sliding_window_view(padded, window, axis=0)
+    #all-NaN windows (frames without a pose) are expected and stay NaN
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        rolling_median = np.nanmedian(windows, axis=-1)
+        deviation = np.linalg.norm(positions - rolling_median, axis=-1)
+        mad = np.nanmedian(deviation, axis=0, keepdims=True)
+
+    #floor the MAD at typical landmark jitter, on still joints and on fast smooth motion
+    #the rolling median tracks the samples so closely that the MAD alone collapses to zero
+    weight = np.clip(landmarks[..., 3], min_visibility, 1.0)
+    outliers = deviation > threshold * weight * np.maximum(mad, 5e-3)
+    positions[outliers] = np.nan
+    return positions
+
+
+def _neighbour_indices(flat):
+    """Index of the previous and next non-NaN sample for every frame of a (frames, series) array"""
+    frames = len(flat)
+    valid = ~np.isnan(flat)
+    idx = np.arange(frames)[:, None]
+    prev_idx = np.maximum.accumulate(np.where(valid, idx, -1), axis=0)
+    next_idx = np.minimum.accumulate(np.where(valid, idx, frames)[::-1], axis=0)[::-1]
+    return valid, prev_idx, next_idx
+
+
+def fill_gaps(positions, max_gap):
+    """
+    Linearly interpolate missing values along the time axis
+    Gaps longer than max_gap frames, and gaps at the start or end, stay NaN
+    Works on any (frames, ...) array without looping over series
+    """
+    frames = len(positions)
+    flat = positions.reshape(frames, -1)
+    valid, prev_idx, next_idx = _neighbour_indices(flat)
+
+    fillable = ~valid & (prev_idx >= 0) & (next_idx < frames) & (next_idx - prev_idx - 1 <= max_gap)
+    prev_val = np.take_along_axis(flat, np.clip(prev_idx, 0, frames - 1), axis=0)
+    next_val = np.take_along_axis(flat, np.clip(next_idx, 0, frames - 1), axis=0)
+    with np.errstate(all="ignore"):
+        weight = (np.arange(frames)[:, None] - prev_idx) / (next_idx - prev_idx)
+    filled = np.where(fillable, prev_val + weight * (next_val - prev_val), flat)
+    return filled.reshape(positions.shape)
+
+
+def hold_nearest(positions):
+    """Replace every missing value with the nearest earlier sample, or the first later one"""
+    frames = len(positions)
+    flat = positions.reshape(frames, -1)
+    valid, prev_idx, next_idx = _neighbour_indices(flat)
+    source = np.clip(np.where(prev_idx >= 0, prev_idx, next_idx), 0, frames - 1)
+    held = np.take_along_axis(flat, source, axis=0)
+    return np.where(valid, flat, held).reshape(positions.shape)
+
+
+def savgol_smooth(positions, window, polyorder=2):
+    """
+    Savitzky-Golay filter along the time axis
+    Missing values are held from the nearest sample while filtering and restored
+    as NaN afterwards, so gaps do not pull the trajectory around them
+    """
+    frames = len(positions)
+    window = min(window, frames if frames % 2 else frames - 1)
+    if window <= polyorder:
+        return positions.copy()
+
+    missing = np.isnan(positions)
+    #series with no valid samples at all are left at zero and masked again below
+    held = np.nan_to_num(hold_nearest(positions))
+
+    smoothed = savgol_filter(held, window, polyorder, axis=0, mode="interp")
+    smoothed[missing] = np.nan
+    return smoothed
+
+
+def _one_euro_pass(positions, fps, min_cutoff, beta, d_cutoff):
+    """Single causal One-Euro pass along the time axis, missing samples reset the filter for that series"""
+    def alpha(cutoff):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau * fps)
+
+    smoothed = np.full_like(positions, np.nan)
+    prev = np.full(positions.shape[1:], np.nan)
+    prev_deriv = np.zeros(positions.shape[1:])
+    alpha_d = alpha(d_cutoff)
+
+    for frame_idx in range(len(positions)):
+        current = positions[frame_idx]
+        restart = np.isnan(prev)
+
+        deriv = np.where(restart, 0.0, (current - prev) * fps)
+        deriv_hat = alpha_d * deriv + (1 - alpha_d) * prev_deriv
+        alpha_x = alpha(min_cutoff + beta * np.abs(deriv_hat))
+        value = np.where(restart, current, alpha_x * current + (1 - alpha_x) * prev)
+
+        smoothed[frame_idx] = value
+        prev = value
+        prev_deriv = np.where(np.isnan(value), 0.0, deriv_hat)
+
+    return smoothed
+
+
+def one_euro_smooth(positions, fps, min_cutoff=2.0, beta=20.0, d_cutoff=2.0):
+    """
+    Zero-phase One-Euro filter along the time axis, vectorized over all landmarks and coordinates
+    Smooths heavily when a joint is slow and lightly when it moves fast. The filter
+    runs forward and then backward over the clip so the lag of each pass cancels out
+    beta is tuned for speeds in normalized frame units per second, where a fast
+    swing crosses the frame in a fraction of a second
+    """
+    forward = _one_euro_pass(positions, fps, min_cutoff, beta, d_cutoff)
+    return _one_euro_pass(forward[::-1], fps, min_cutoff, beta, d_cutoff)[::-1]
+
+
+def smooth_landmarks(landmarks, fps, method="savgol", max_gap_seconds=0.25, window_seconds=0.3):
+    """
+    Offline post-processing for per-frame pose landmarks
+    Rejects low-visibility and outlier points, fills short gaps, then smooths
+    each trajectory with the chosen method
+    landmarks is a (frames, 33, 4) array of x, y, z, visibility with NaN rows
+    for frames without a pose
+    Returns a smoothed array of the same shape, visibility is kept as detected
+    except that points which could not be recovered are marked NaN
+    """
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f"Unknown smoothing method: {method}")
+    if len(landmarks) == 0:
+        return landmarks.copy()
+
+    fps = fps or 30
+    positions = reject_outliers(landmarks)
+    positions = fill_gaps(positions, max(1, int(round(max_gap_seconds * fps))))
+
+    if method == "savgol":
+        window = max(5, int(round(window_seconds * fps)) | 1)
+        positions = savgol_smooth(positions, window)
+    else:
+        positions = one_euro_smooth(positions, fps)
+
+    result = np.empty_like(landmarks, dtype=np.float32)
+    result[..., :3] = positions
+    #points recovered by gap filling count as visible
+    recovered = ~np.isnan(positions).any(axis=-1)
+    result[..., 3] = np.where(recovered, np.fmax(landmarks[..., 3], MIN_VISIBILITY), np.nan)
+    return result
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import struct
+import asyncio
+import logging
+
+import cv2
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .mediapipe_processor import create_pose
+from .landmarks import landmarks_to_array
+from .metrics import live_metrics
+
+#set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+#frames older than this when the processor gets to them are dropped instead of analyzed
+MAX_FRAME_AGE_MS = int(os.environ.get("RV_STREAM_MAX_FRAME_AGE_MS", 500))
+
+#incoming frames are downscaled to this size before inference, like uploaded videos
+MAX_DIMENSION = 640
+
+#timestamped frames start with the capture time in seconds as a little-endian float64
+FRAME_TIME = struct.Struct("<d")
+
+
+class StreamSession:
+    """
+    Pose state for one live connection
+    Keeps a tracking-mode pose model for the whole session so landmarks stay
+    smooth from frame to frame, and the previous result for speed metrics
+    """
+
+    def __init__(self):
+        self.pose = create_pose()
+        self.raw_size = None
+        self.timestamped = False
+        self.prev_landmarks = None
+        self.prev_time = None
+
+    def configure(self, message):
+        """
+        Handle a JSON control message, raw frames need their size up front
+        Raises ValueError for an invalid message, the previous settings are then kept
+        """
+        raw_size = None
+        if message.get("format") == "bgr24":
+            try:
+                raw_size = (int(message["width"]), int(message["height"]))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("bgr24 frames need a numeric width and height")
+            if min(raw_size) <= 0:
+                raise ValueError("width and height must be positive")
+
+        timestamped = message.get("timestamped", False)
+        if not isinstance(timestamped, bool):
+            raise ValueError("timestamped must be true or false")
+
+        self.raw_size = raw_size
+        self.timestamped = timestamped
+
+    def decode(self, data):
+        """Decode an encoded image (JPEG, PNG) or a raw bgr24 frame"""
+        if self.raw_size is not None:
+            width, height = self.raw_size
+            if len(data) != width * height * 3:
+                raise ValueError(f"Raw frame is {len(data)} bytes, expected {width * height * 3}")
+            return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+        return frame
+
+    def process(self, data, received_at):
+        """
+        Run pose on one frame and return the landmarks and live metrics
+        Speeds use the client's capture time when frames are timestamped, and the
+        server receipt time otherwise, which adds network jitter
+        """
+        captured_at = received_at
+        if self.timestamped:
+            if len(data) < FRAME_TIME.size:
+                raise ValueError("Timestamped frame is missing its capture time")
+            (captured_at,) = FRAME_TIME.unpack_from(data)
+            data = data[FRAME_TIME.size:]
+
+        frame = self.decode(data)
+        height, width = frame.shape[:2]
+        scale = MAX_DIMENSION / max(width, height)
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_LINEAR)
+
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame_rgb.flags.writeable = False
+        results = self.pose.process(frame_rgb)
+
+        if not results.pose_landmarks:
+            self.prev_landmarks = None
+            return None, None
+
+        landmarks = landmarks_to_array(results.pose_landmarks)
+        dt = captured_at - self.prev_time if self.prev_time is not None else None
+        metrics = live_metrics(landmarks, self.prev_landmarks, dt, aspect=width / height)
+        self.prev_landmarks = landmarks
+        self.prev_time = captured_at
+        return landmarks, metrics
+
+    def close(self):
+        self.pose.close()
+
+
+async def handle_stream(websocket: WebSocket):
+    """
+    Live analysis over a WebSocket
+    The client sends frames as binary messages (JPEG/PNG, or raw bgr24 after a
+    {"type": "config", "format": "bgr24", "width": ..., "height": ...} text message)
+    and gets one JSON message back per analyzed frame. With "timestamped": true in
+    the config, every frame starts with its capture time (see FRAME_TIME)
+    Only the newest frame is kept while the previous one is being analyzed, so
+    under load frames are dropped rather than queued and latency stays bounded
+    """
+    await websocket.accept()
+    #loading the pose model takes a while, keep it off the event loop
+    session = await asyncio.to_thread(StreamSession)
+    logger.info("Live analysis session started")
+
+    #single slot holding the newest unprocessed frame
+    slot = {"data": None, "seq": None, "received_at": None}
+    frame_ready = asyncio.Event()
+    stats = {"received": 0, "processed": 0, "dropped": 0}
+    closing = False
+    #inference running on a worker thread, it cannot be cancelled and must finish before close
+    inflight = None
+
+    async def receive_frames():
+        """Returns True when the client ends the stream, False if it disconnects"""
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return False
+            if message.get("text") is not None:
+                try:
+                    control = json.loads(message["text"])
+                    if not isinstance(control, dict):
+                        raise ValueError("Control messages must be JSON objects")
+                    if control.get("type") == "config":
+                        session.configure(control)
+                    elif control.get("type") == "end":
+                        return True
+                except ValueError as e:
+                    logger.warning(f"Rejected control message: {str(e)}")
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+
+            if slot["data"] is not None:
+                stats["dropped"] += 1
+            slot["data"] = message["bytes"]
+            slot["seq"] = stats["received"]
+            slot["received_at"] = time.monotonic()
+            stats["received"] += 1
+            frame_ready.set()
+
+    async def process_frames():
+        nonlocal inflight
+        while True:
+            if slot["data"] is None:
+                if closing:
+                    return
+                await frame_ready.wait()
+                frame_ready.clear()
+            data, seq, received_at = slot["data"], slot["seq"], slot["received_at"]
+            slot["data"] = None
+            if data is None:
+                continue
+
+            queued_ms = (time.monotonic() - received_at) * 1000
+            if queued_ms > MAX_FRAME_AGE_MS:
+                stats["dropped"] += 1
+                continue
+
+            try:
+                inflight = asyncio.ensure_future(asyncio.to_thread(session.process, data, received_at))
+                #shielded so cancelling the processor leaves the thread's result to the cleanup below
+                landmarks, metrics = await asyncio.shield(inflight)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": str(e)})
+                continue
+
+            stats["processed"] += 1
+            await websocket.send_json({
+                "type": "frame",
+                "seq": seq,
+                "landmarks": landmarks.round(4).tolist() if landmarks is not None else None,
+                "metrics": metrics,
+                "latency_ms": round((time.monotonic() - received_at) * 1000, 1),
+                "dropped": stats["dropped"]
+            })
+
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    try:
+        if await receiver:
+            #finish the frame in flight and the pending one, then stop
+            closing = True
+            frame_ready.set()
+            await processor
+            await websocket.send_json({"type": "summary", **stats})
+            await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in live analysis session: {str(e)}")
+    finally:
+        processor.cancel()
+        try:
+            await processor
+        except (asyncio.CancelledError, Exception):
+            pass
+        if inflight is not None:
+            await asyncio.gather(inflight, return_exceptions=True)
+        await asyncio.to_thread(session.close)
+        logger.info(
+            f"Live analysis session ended: {stats['received']} frames received, "
+            f"{stats['processed']} processed, {stats['dropped']} dropped"
+        )
@@ -0,0 +1,241 @@
+import os
+import time
+import asyncio
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from starlette.responses import FileResponse
+
+#set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+#defaults, overridable through environment variables
+DEFAULT_TTL_SECONDS = int(os.environ.get("RV_TEMP_TTL_SECONDS", 6 * 60 * 60))
+DEFAULT_MAX_BYTES = int(os.environ.get("RV_TEMP_MAX_MB", 2048)) * 1024 * 1024
+DEFAULT_SWEEP_INTERVAL = int(os.environ.get("RV_TEMP_SWEEP_SECONDS", 300))
+DEFAULT_DIR = os.environ.get(
+    "RV_TEMP_DIR", os.path.join(tempfile.gettempdir(), "racketvision")
+)
+
+
+class _Entry:
+    __slots__ = ("size", "last_access", "refs")
+
+    def __init__(self, size, last_access):
+        self.size = size
+        self.last_access = last_access
+        self.refs = 0
+
+
+class TempFileStore:
+    """
+    Scratch store for uploaded and processed videos
+    Files expire once they have been idle for longer than the TTL, and the
+    least recently used files are evicted when the total size goes over the quota.
+    Files with outstanding references (being processed or served) are never removed.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_bytes=DEFAULT_MAX_BYTES, sweep_interval=DEFAULT_SWEEP_INTERVAL):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        #ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._adopt_existing_files()
+
+    def _adopt_existing_files(self):
+        """Track files left over from a previous run so they still expire"""
+        existing = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                existing.append((stat.st_mtime, path, stat.st_size))
+
+        for mtime, path, size in sorted(existing):
+            self._entries[path] = _Entry(size, mtime)
+            self._total_bytes += size
+
+        if existing:
+            logger.info(f"Adopted {len(existing)} existing files in {self.directory}")
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def path_for(self, filename):
+        """Return the absolute path a file with this name would have in the store"""
+        return os.path.join(self.directory, os.path.basename(filename))
+
+    def register(self, path, pin=False):
+        """
+        Start tracking a file that was written into the store directory
+        If pin is True the caller holds a reference and must call release()
+        Returns the path
+        """
+        path = os.path.abspath(path)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is None:
+                entry = _Entry(size, time.time())
+            else:
+                self._total_bytes -= entry.size
+                entry.size = size
+                entry.last_access = time.time()
+            if pin:
+                entry.refs += 1
+            self._entries[path] = entry
+            self._total_bytes += size
+
+        logger.info(f"Registered temporary file: {path} ({size} bytes)")
+
+        #keep the quota enforced as files arrive rather than only on the timer
+        if self._total_bytes > self.max_bytes:
+            self.sweep()
+        return path
+
+    def acquire(self, path):
+        """Take a reference on a tracked file, returns False if it is not tracked"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or not os.path.exists(path):
+                return False
+            entry.refs += 1
+            entry.last_access = time.time()
+            self._entries.move_to_end(path)
+            return True
+
+    def release(self, path):
+        """Drop a reference taken by acquire() or register(pin=True)"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_access = time.time()
+
+    def release_all(self, paths):
+        for path in paths:
+            if path:
+                self.release(path)
+
+    @contextmanager
+    def pinned(self, path):
+        """Hold a reference on a file for the duration of a with block"""
+        acquired = self.acquire(path)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(path)
+
+    def sweep(self):
+        """
+        Remove expired files, then evict least recently used files until the
+        store is back under its quota
+        Returns the list of removed paths
+        """
+        now = time.time()
+        to_remove = []
+
+        with self._lock:
+            for path, entry in list(self._entries.items()):
+                if entry.refs == 0 and now - entry.last_access > self.ttl_seconds:
+                    to_remove.append(path)
+                    self._forget(path)
+
+            #entries are in LRU order so the first unpinned ones go first
+            if self._total_bytes > self.max_bytes:
+                for path, entry in list(self._entries.items()):
+                    if self._total_bytes <= self.max_bytes:
+                        break
+                    if entry.refs == 0:
+                        to_remove.append(path)
+                        self._forget(path)
+
+            if self._total_bytes > self.max_bytes:
+                logger.warning(
+                    f"Temp store over quota ({self._total_bytes} > {self.max_bytes} bytes) "
+                    f"but remaining files are in use"
+                )
+
+        #unlink outside the lock, the entries are already gone
+        for path in to_remove:
+            try:
+                if os.path.exists(path):
+                    os.unlink(path)
+                logger.info(f"Removed temporary file: {path}")
+            except Exception as e:
+                logger.error(f"Error removing temporary file {path}: {str(e)}")
+
+        return to_remove
+
+    def _forget(self, path):
+        entry = self._entries.pop(path)
+        self._total_bytes -= entry.size
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await asyncio.to_thread(self.sweep)
+                if removed:
+                    logger.info(f"Sweeper removed {len(removed)} files, {self._total_bytes} bytes in use")
+            except Exception as e:
+                logger.error(f"Error sweeping temporary files: {str(e)}")
+
+    def start(self):
+        """Start the periodic sweeper on the running event loop"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+            logger.info(
+                f"Temp store sweeper started: dir={self.directory}, ttl={self.ttl_seconds}s, "
+                f"quota={self.max_bytes} bytes, interval={self.sweep_interval}s"
+            )
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+
+class StoreFileResponse(FileResponse):
+    """
+    FileResponse for a file the caller has acquire()d from a store
+    The reference is dropped however the response ends. Starlette skips background
+    tasks on early returns such as an unsatisfiable Range or a file that vanished,
+    so the release cannot be a background task
+    """
+
+    def __init__(self, path, store, **kwargs):
+        super().__init__(path, **kwargs)
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.store.release(self.path)
+
+
+#shared store used by the API
+temp_store = TempFileStore()
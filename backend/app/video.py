@@ -2,6 +2,9 @@ import os
 import tempfile
 from pathlib import Path
 import uuid
+import hashlib
+import shutil
+import zipfile
 import logging
 from fastapi import UploadFile
 
@@ -11,15 +14,16 @@ from .supabase_client import supabase, VIDEOS_BUCKET
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def save_upload_file(upload_file: UploadFile) -> str:
+async def save_upload_file(upload_file: UploadFile, directory: str = None) -> str:
     """
     Save the uploaded file to a temporary location
+    Uses the system temp directory unless a directory is given
     Returns the path to the saved file
     """
     try:
         #create a temporary file
         suffix = Path(upload_file.filename).suffix
-        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False, dir=directory) as temp_file:
             #write the uploaded file to the temporary file
             content = await upload_file.read()
             temp_file.write(content)
@@ -29,6 +33,52 @@ async def save_upload_file(upload_file: UploadFile) -> str:
         logger.error(f"Error saving uploaded file: {str(e)}", exc_info=True)
         raise
 
+def file_sha256(file_path: str) -> str:
+    """Hex SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_video_archive(zip_path: str, directory: str, extensions, max_files: int, max_bytes: int) -> list:
+    """
+    Extract the video files from a zip archive into the given directory
+    Entries that are not videos are skipped, and a ValueError is raised if
+    there are more than max_files videos or they add up to more than max_bytes
+    uncompressed, before anything is written
+    Returns a list of (name in archive, extracted path) tuples
+    """
+    extracted = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(extensions)
+                and not os.path.basename(info.filename).startswith('.')
+            ]
+            if len(members) > max_files:
+                raise ValueError(f"Archive contains {len(members)} videos, the limit is {max_files}")
+            
+            #zipfile stops reading a member at its declared size, so the header sizes can be trusted
+            total_size = sum(info.file_size for info in members)
+            if total_size > max_bytes:
+                raise ValueError(f"Archive videos are {total_size} bytes uncompressed, the limit is {max_bytes}")
+            
+            for info in sorted(members, key=lambda info: info.filename):
+                #never trust paths inside the archive, write to a fresh temp file instead
+                suffix = Path(info.filename).suffix
+                with archive.open(info) as source, tempfile.NamedTemporaryFile(suffix=suffix, delete=False, dir=directory) as temp_file:
+                    shutil.copyfileobj(source, temp_file)
+                extracted.append((info.filename, temp_file.name))
+                logger.info(f"Extracted {info.filename} to temporary location: {temp_file.name}")
+        return extracted
+    except Exception as e:
+        logger.error(f"Error extracting archive {zip_path}: {str(e)}", exc_info=True)
+        cleanup_temp_files([path for _, path in extracted])
+        raise
+
 def upload_to_supabase(file_path: str, file_type: str) -> str:
     """
     Upload a file to Supabase storage
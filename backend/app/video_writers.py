@@ -0,0 +1,175 @@
+import os
+import av
+import cv2
+import logging
+from fractions import Fraction
+from functools import lru_cache
+
+#set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Codecs tried in order for best compatibility
+CODEC_OPTIONS = [
+    ('avc1', cv2.VideoWriter_fourcc(*'avc1')),  # H.264 - best for web
+    ('H264', cv2.VideoWriter_fourcc(*'H264')),  # Alternative H.264
+    ('mp4v', cv2.VideoWriter_fourcc(*'mp4v')),  # Fallback
+]
+
+#default length of an HLS segment
+SEGMENT_SECONDS = float(os.environ.get("RV_HLS_SEGMENT_SECONDS", 4))
+
+
+def open_video_writer(output_path, fps, size, codecs=CODEC_OPTIONS):
+    """
+    Open a cv2.VideoWriter with the first of codecs that works
+    The container is picked from the file extension
+    Returns the writer and the codec name
+    """
+    for codec_name, codec_fourcc in codecs:
+        out = cv2.VideoWriter(output_path, codec_fourcc, fps, size)
+        if out.isOpened():
+            return out, codec_name
+        out.release()
+
+    raise ValueError("Could not create output video file with any codec")
+
+
+@lru_cache(maxsize=None)
+def hls_supported():
+    """Whether PyAV has the libx264 encoder needed for HLS segments, checked once"""
+    try:
+        av.codec.Codec("libx264", "w")
+    except Exception:
+        logger.warning("PyAV has no libx264 encoder, HLS output is disabled")
+        return False
+    return True
+
+
+class HlsWriter:
+    """
+    Write frames as a growing HLS event playlist of MPEG-TS segments
+    HLS players (hls.js, Safari) only decode H.264, which the pip OpenCV builds
+    cannot encode, so segments are encoded with PyAV's bundled libx264
+    Each segment is encoded by its own encoder so it starts on a keyframe and can
+    be played as soon as it is finished. Timestamps continue across segments, so
+    the playlist needs no discontinuities. The playlist is rewritten atomically
+    after every segment so players polling it only ever see complete segments
+    on_update is called with the path of every segment file written, and with
+    the playlist path every time it is rewritten
+    """
+
+    def __init__(self, playlist_path, fps, size, segment_seconds=SEGMENT_SECONDS, on_update=None):
+        self.playlist_path = playlist_path
+        self.fps = fps
+        self.size = size
+        self.frames_per_segment = max(1, int(round(fps * segment_seconds)))
+        self.target_duration = int(-(-self.frames_per_segment // fps))
+        self.on_update = on_update
+
+        self._rate = Fraction(fps).limit_denominator(1001)
+        #yuv420p needs even dimensions, odd sizes lose their last row or column
+        self._encoded_size = (size[0] // 2 * 2, size[1] // 2 * 2)
+        self._prefix = os.path.splitext(playlist_path)[0]
+        self._segments = []
+        self._container = None
+        self._stream = None
+        self._segment_path = None
+        self._segment_frames = 0
+        self._frames_written = 0
+        self._ended = False
+
+        self._write_playlist()
+
+    def _segment_name(self, index):
+        return f"{os.path.basename(self._prefix)}_{index:05d}.ts"
+
+    def _open_segment(self):
+        index = len(self._segments)
+        self._segment_path = os.path.join(os.path.dirname(self.playlist_path), f".{self._segment_name(index)}")
+        self._container = av.open(self._segment_path, "w", format="mpegts")
+        self._stream = self._container.add_stream("libx264", rate=self._rate, options={"preset": "veryfast"})
+        self._stream.width, self._stream.height = self._encoded_size
+        self._stream.pix_fmt = "yuv420p"
+        #B-frames would make the first segment start late and overlap the next one
+        self._stream.codec_context.max_b_frames = 0
+        self._segment_frames = 0
+
+    def _close_container(self):
+        container, self._container, self._stream = self._container, None, None
+        container.close()
+
+    def write(self, frame):
+        """Add one BGR frame"""
+        if self._container is None:
+            self._open_segment()
+
+        video_frame = av.VideoFrame.from_ndarray(frame, format="bgr24")
+        video_frame.pts = self._frames_written
+        video_frame.time_base = 1 / self._rate
+        self._container.mux(self._stream.encode(video_frame))
+        self._frames_written += 1
+        self._segment_frames += 1
+        if self._segment_frames >= self.frames_per_segment:
+            self._finish_segment()
+
+    def _finish_segment(self):
+        #flush the frames the encoder is still holding
+        self._container.mux(self._stream.encode(None))
+        self._close_container()
+
+        #publish under the final name only once the segment is complete
+        name = self._segment_name(len(self._segments))
+        final_path = os.path.join(os.path.dirname(self.playlist_path), name)
+        os.replace(self._segment_path, final_path)
+        self._segments.append((name, self._segment_frames / self.fps))
+        if self.on_update:
+            self.on_update(final_path)
+
+        self._write_playlist()
+        logger.info(f"HLS segment ready: {name} ({len(self._segments)} total)")
+
+    def _write_playlist(self):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:6",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            #players treat an unfinished event playlist as live, start from the beginning instead
+            "#EXT-X-START:TIME-OFFSET=0",
+        ]
+        for name, duration in self._segments:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(name)
+        if self._ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        temp_path = f"{self.playlist_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.playlist_path)
+        if self.on_update:
+            self.on_update(self.playlist_path)
+
+    def close(self):
+        """Finish the last partial segment and mark the playlist as complete"""
+        if self._ended:
+            return
+        if self._container is not None:
+            self._finish_segment()
+        self._ended = True
+        self._write_playlist()
+
+    def abort(self):
+        """Stop writing after an error, dropping the unfinished segment"""
+        if self._container is not None:
+            try:
+                self._close_container()
+            except Exception as e:
+                logger.error(f"Error closing HLS segment: {str(e)}")
+            if os.path.exists(self._segment_path):
+                os.remove(self._segment_path)
+        if not self._ended:
+            self._ended = True
+            self._write_playlist()
@@ -0,0 +1,69 @@
+import os
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .mediapipe_processor import analyze_clip, create_pose
+from .multi_player import MultiPlayerTracker
+
+#set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+#number of clips processed at the same time
+MAX_WORKERS = int(os.environ.get("RV_WORKERS", max(1, min(4, (os.cpu_count() or 2) // 2))))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="rv-worker")
+
+#each worker thread keeps its own warm pose model (and multi-player tracker with its
+#pooled per-player models), models are not thread safe
+_local = threading.local()
+
+
+def _warm_pose():
+    pose = getattr(_local, "pose", None)
+    if pose is None:
+        logger.info(f"Loading pose model for {threading.current_thread().name}")
+        pose = create_pose()
+        _local.pose = pose
+    return pose
+
+
+def _warm_tracker():
+    tracker = getattr(_local, "tracker", None)
+    if tracker is None:
+        tracker = MultiPlayerTracker(create_pose)
+        _local.tracker = tracker
+    return tracker
+
+
+def _analyze_in_worker(video_path, output_dir, players, smoothing, options):
+    if players > 1:
+        return analyze_clip(video_path, output_dir, players=players, tracker=_warm_tracker(), **options)
+    if smoothing is not None:
+        #offline smoothing runs on the shared inference threads, no tracking model needed
+        return analyze_clip(video_path, output_dir, smoothing=smoothing, **options)
+    return analyze_clip(video_path, output_dir, pose=_warm_pose(), **options)
+
+
+def submit_analysis(video_path, output_dir=None, players=1, smoothing=None, **options):
+    """
+    Queue a clip on the worker pool and return its concurrent.futures.Future
+    The analysis keeps running if the caller goes away, so callers that may be
+    cancelled should hold on to the future and clean up its output once it is done
+    """
+    return _executor.submit(_analyze_in_worker, video_path, output_dir, players, smoothing, options)
+
+
+async def run_analysis(video_path, output_dir=None, players=1, smoothing=None, **options):
+    """
+    Analyze a clip on the worker pool without blocking the event loop
+    Extra options (such as hls_playlist) are passed through to analyze_clip
+    Returns the clip result dict from analyze_clip
+    """
+    return await asyncio.wrap_future(submit_analysis(video_path, output_dir, players, smoothing, **options))
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
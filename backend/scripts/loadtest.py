@@ -0,0 +1,346 @@
+"""
+Concurrent load test for the RacketVision API
+
+    python scripts/loadtest.py --concurrency 4 --requests 20
+    python scripts/loadtest.py --pool-workers 1 --pool-workers 2 --pool-workers 4
+    python scripts/loadtest.py --smoothing savgol --players 2 --json results.json
+
+Starts the app in a single uvicorn process (one server per --pool-workers value,
+which sets RV_WORKERS, the size of the clip worker pool) using local file
+storage instead of Supabase, then simulates users that upload a synthetic video
+to /analyze and download the original and processed videos from /api/video.
+Reports throughput, p50/p95/p99 latency and error rate per endpoint, plus the
+server's resident memory, so pool sizes and processing modes can be compared
+Use --url to target a server that is already running (memory is only reported
+for it when --pid is given)
+Running the app with more than one uvicorn worker process is not supported, the
+HLS job table and the temp store reference counts live in each process
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import cv2
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def make_synthetic_video(path, seconds, fps, width, height, seed):
+    """
+    Write a clip of a stick figure swinging at a moving ball
+    Different seeds give different motion, so every clip has its own content hash
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise SystemExit(f"Could not create synthetic video: {path}")
+
+    background = np.full((height, width, 3), (60, 120, 40), dtype=np.uint8)
+    cv2.line(background, (0, int(height * 0.8)), (width, int(height * 0.8)), (255, 255, 255), 3)
+    phase = rng.uniform(0, 2 * np.pi)
+    center_x = int(width * rng.uniform(0.3, 0.6))
+    unit = height / 10
+
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        frame = background.copy()
+        hip = (center_x + int(unit * np.sin(0.5 * t + phase)), int(height * 0.55))
+        neck = (hip[0], int(hip[1] - 2.5 * unit))
+        head = (neck[0], int(neck[1] - 0.7 * unit))
+        swing = np.sin(3 * t + phase)
+        hand = (int(neck[0] + 1.8 * unit * np.cos(swing)), int(neck[1] + 1.8 * unit * np.sin(swing)))
+
+        cv2.circle(frame, head, int(0.5 * unit), (180, 200, 230), -1)
+        cv2.line(frame, neck, hip, (30, 30, 200), int(0.4 * unit))
+        cv2.line(frame, neck, hand, (180, 200, 230), int(0.2 * unit))
+        for side in (-1, 1):
+            foot = (int(hip[0] + side * 0.8 * unit), int(hip[1] + 2.5 * unit))
+            cv2.line(frame, hip, foot, (40, 40, 40), int(0.25 * unit))
+
+        ball = (int((t * 0.4 * width + seed * 37) % width), int(height * 0.4 + unit * np.sin(4 * t)))
+        cv2.circle(frame, ball, max(2, int(0.12 * unit)), (60, 255, 220), -1)
+        writer.write(frame)
+
+    writer.release()
+
+
+class MemorySampler:
+    """Samples a process's resident memory from /proc (Linux only)"""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+
+    def read_rss_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    async def run(self):
+        while True:
+            rss = self.read_rss_mb()
+            if rss is not None:
+                self.samples.append(rss)
+            await asyncio.sleep(self.interval)
+
+    def summary(self):
+        if not self.samples:
+            return None
+        return {
+            "start_mb": round(self.samples[0], 1),
+            "peak_mb": round(max(self.samples), 1),
+            "end_mb": round(self.samples[-1], 1),
+        }
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.details = []
+
+    def record(self, endpoint, seconds, ok, detail=None):
+        self.latencies.setdefault(endpoint, [])
+        self.errors.setdefault(endpoint, 0)
+        if ok:
+            self.latencies[endpoint].append(seconds * 1000)
+        else:
+            self.errors[endpoint] += 1
+            if detail and len(self.details) < 10:
+                self.details.append(f"{endpoint}: {detail}")
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            total = len(latencies) + self.errors[endpoint]
+            endpoints[endpoint] = {
+                "requests": total,
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / total if total else 0.0,
+                "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+            }
+        return endpoints
+
+
+def video_path_from_url(url):
+    """/api/video URLs are built for localhost:8000, only the path is used against the target server"""
+    return urlparse(url).path
+
+
+async def wait_for_job(client, job_id, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        response = await client.get(f"/api/jobs/{job_id}")
+        response.raise_for_status()
+        job = response.json()
+        if job["status"] in ("done", "error"):
+            return job
+        await asyncio.sleep(0.25)
+    raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
+
+
+async def analyze(client, video, args):
+    """Upload a clip, returns the original and processed URLs"""
+    params = {"players": args.players, "output": args.output}
+    if args.smoothing:
+        params["smoothing"] = args.smoothing
+    with open(video, "rb") as f:
+        response = await client.post(
+            "/analyze", params=params, files={"file": (os.path.basename(video), f, "video/mp4")}
+        )
+    response.raise_for_status()
+    result = response.json()
+
+    if args.output == "hls":
+        job = await wait_for_job(client, result["job_id"], args.timeout)
+        if job["status"] != "done":
+            raise RuntimeError(job.get("detail", "job failed"))
+        result = job
+    return result["original_url"], result["processed_url"]
+
+
+async def fetch_video(client, url):
+    """Download a video completely, returns the number of bytes"""
+    size = 0
+    async with client.stream("GET", video_path_from_url(url)) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+    return size
+
+
+async def simulate_user(client, videos, args, stats, counter):
+    while True:
+        index = counter["next"]
+        if index >= args.requests:
+            return
+        counter["next"] += 1
+
+        started = time.perf_counter()
+        try:
+            urls = await analyze(client, videos[index % len(videos)], args)
+        except Exception as e:
+            stats.record("analyze", time.perf_counter() - started, False, repr(e))
+            continue
+        stats.record("analyze", time.perf_counter() - started, True)
+
+        for _ in range(args.video_fetches):
+            for url in urls:
+                started = time.perf_counter()
+                try:
+                    await fetch_video(client, url)
+                except Exception as e:
+                    stats.record("video", time.perf_counter() - started, False, repr(e))
+                    continue
+                stats.record("video", time.perf_counter() - started, True)
+
+
+def start_server(args, pool_workers, work_dir):
+    """Start one uvicorn process with local storage, returns the process once the app answers"""
+    env = dict(os.environ)
+    env.update({
+        #empty credentials make the app serve videos from its own /api/video endpoint
+        "SUPABASE_URL": "",
+        "SUPABASE_KEY": "",
+        "RV_WORKERS": str(pool_workers),
+        "RV_TEMP_DIR": os.path.join(work_dir, f"temp_{pool_workers}"),
+        "RV_DATA_DIR": os.path.join(work_dir, f"data_{pool_workers}"),
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+
+    process.terminate()
+    raise SystemExit("Server did not start within 60s")
+
+
+async def run_load(base_url, pid, videos, args):
+    stats = Stats()
+    sampler = MemorySampler(pid) if pid else None
+    sampler_task = asyncio.create_task(sampler.run()) if sampler else None
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        counter = {"next": 0}
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_user(client, videos, args, stats, counter) for _ in range(args.concurrency)
+        ))
+        wall_seconds = time.perf_counter() - started
+
+    if sampler_task:
+        sampler_task.cancel()
+    return {
+        "wall_seconds": wall_seconds,
+        "endpoints": stats.summary(wall_seconds),
+        "memory": sampler.summary() if sampler else None,
+        "sample_errors": stats.details,
+    }
+
+
+def print_report(label, report):
+    print(f"\n== {label} ({report['wall_seconds']:.1f}s) ==")
+    print(f"{'endpoint':<10}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, s in report["endpoints"].items():
+        print(
+            f"{endpoint:<10}{s['requests']:>9}{s['errors']:>8}{s['throughput_rps']:>8.2f}"
+            f"{s['p50_ms']:>10.0f}{s['p95_ms']:>10.0f}{s['p99_ms']:>10.0f}"
+        )
+    if report["memory"]:
+        m = report["memory"]
+        print(f"server RSS: start {m['start_mb']} MB, peak {m['peak_mb']} MB, end {m['end_mb']} MB")
+    for detail in report["sample_errors"]:
+        print(f"  error {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RacketVision API")
+    parser.add_argument("--concurrency", type=int, default=4, help="Simulated users sending requests at the same time")
+    parser.add_argument("--requests", type=int, default=20, help="Total /analyze requests per run")
+    parser.add_argument("--video-fetches", type=int, default=1,
+                        help="Times each user downloads the original and processed video after an analysis")
+    parser.add_argument("--pool-workers", type=int, action="append",
+                        help="RV_WORKERS (clip worker pool size) for the started server, repeat to compare several values")
+    parser.add_argument("--players", type=int, default=1, help="players query parameter")
+    parser.add_argument("--smoothing", choices=("savgol", "one_euro"), help="smoothing query parameter")
+    parser.add_argument("--output", choices=("mp4", "hls"), default="mp4", help="output query parameter")
+    parser.add_argument("--clips", type=int, default=4, help="Number of distinct synthetic clips")
+    parser.add_argument("--seconds", type=float, default=3, help="Length of each synthetic clip")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the synthetic clips")
+    parser.add_argument("--size", default="640x360", help="Resolution of the synthetic clips")
+    parser.add_argument("--video", action="append", help="Use these videos instead of synthetic clips")
+    parser.add_argument("--port", type=int, default=8123, help="Port for the started server")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="Process id of the --url server, to report its memory")
+    parser.add_argument("--timeout", type=float, default=600, help="Per request timeout in seconds")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rv_loadtest_") as work_dir:
+        videos = args.video
+        if not videos:
+            width, height = (int(v) for v in args.size.lower().split("x"))
+            videos = []
+            for seed in range(args.clips):
+                path = os.path.join(work_dir, f"synthetic_{seed}.mp4")
+                make_synthetic_video(path, args.seconds, args.fps, width, height, seed)
+                videos.append(path)
+
+        mode = f"players={args.players} smoothing={args.smoothing} output={args.output}"
+        print(f"{args.requests} requests from {args.concurrency} users, {mode}")
+        results = {}
+        if args.url:
+            results["external"] = asyncio.run(run_load(args.url, args.pid, videos, args))
+            print_report(args.url, results["external"])
+        else:
+            for pool_workers in args.pool_workers or [int(os.environ.get("RV_WORKERS", 2))]:
+                process = start_server(args, pool_workers, work_dir)
+                try:
+                    report = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", process.pid, videos, args))
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+                results[f"pool_workers={pool_workers}"] = report
+                print_report(f"pool_workers={pool_workers}", report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": mode, "concurrency": args.concurrency, "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Replay a video file as a live frame stream against the /ws/analyze endpoint
+
+    python scripts/stream_replay.py clip.mp4
+    python scripts/stream_replay.py clip.mp4 --fps 60 --raw
+
+Frames are sent at the video's frame rate (or --fps), like a courtside camera
+would, and the script reports how many were analyzed or dropped and the
+round trip latency. Each frame carries its time in the video as the capture
+time, so speeds do not depend on network jitter
+"""
+import argparse
+import asyncio
+import json
+import time
+import struct
+
+import cv2
+import numpy as np
+import websockets
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+async def replay(args):
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open video file: {args.video}")
+    fps = args.fps or cap.get(cv2.CAP_PROP_FPS) or 30
+    interval = 1.0 / fps
+
+    sent_at = {}
+    latencies = []
+    server_latencies = []
+    summary = {}
+
+    async with websockets.connect(args.url, max_size=None) as ws:
+        async def send_frames():
+            seq = 0
+            configured = False
+            start = time.perf_counter()
+            if not args.raw:
+                await ws.send(json.dumps({"type": "config", "timestamped": True}))
+            while True:
+                success, frame = cap.read()
+                if not success:
+                    break
+                height, width = frame.shape[:2]
+                scale = args.max_dimension / max(width, height)
+                if scale < 1.0:
+                    frame = cv2.resize(frame, (int(width * scale), int(height * scale)))
+
+                if args.raw:
+                    if not configured:
+                        await ws.send(json.dumps({
+                            "type": "config", "format": "bgr24", "timestamped": True,
+                            "width": frame.shape[1], "height": frame.shape[0]
+                        }))
+                        configured = True
+                    payload = np.ascontiguousarray(frame).tobytes()
+                else:
+                    payload = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes()
+
+                #pace frames like a live camera
+                delay = start + seq * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent_at[seq] = time.perf_counter()
+                await ws.send(struct.pack("<d", seq * interval) + payload)
+                seq += 1
+            await ws.send(json.dumps({"type": "end"}))
+            return seq
+
+        async def receive_results():
+            async for message in ws:
+                result = json.loads(message)
+                if result["type"] == "frame":
+                    latencies.append((time.perf_counter() - sent_at[result["seq"]]) * 1000)
+                    server_latencies.append(result["latency_ms"])
+                    if args.verbose and result["metrics"]:
+                        print(f"frame {result['seq']}: {result['metrics']}")
+                elif result["type"] == "summary":
+                    summary.update(result)
+                elif result["type"] == "error":
+                    print(f"frame {result.get('seq')} error: {result['detail']}")
+
+        started = time.perf_counter()
+        sent, _ = await asyncio.gather(send_frames(), receive_results())
+        elapsed = time.perf_counter() - started
+
+    cap.release()
+    print(f"Sent {sent} frames at {fps:.1f} fps in {elapsed:.1f}s")
+    print(f"Analyzed {summary.get('processed', len(latencies))}, dropped {summary.get('dropped', 'unknown')}")
+    print(f"Analyzed rate: {len(latencies) / elapsed:.1f} fps")
+    print(
+        f"Round trip latency ms: p50 {percentile(latencies, 50):.1f}, "
+        f"p95 {percentile(latencies, 95):.1f}, p99 {percentile(latencies, 99):.1f}"
+    )
+    print(f"Server latency ms: p50 {percentile(server_latencies, 50):.1f}, p95 {percentile(server_latencies, 95):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video as a live stream to the RacketVision API")
+    parser.add_argument("video", help="Video file to replay")
+    parser.add_argument("--url", default="ws://localhost:8000/ws/analyze", help="WebSocket endpoint")
+    parser.add_argument("--fps", type=float, default=0, help="Send rate, defaults to the video frame rate")
+    parser.add_argument("--max-dimension", type=int, default=640, help="Downscale frames before sending")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--raw", action="store_true", help="Send raw bgr24 frames instead of JPEG")
+    parser.add_argument("--verbose", action="store_true", help="Print live metrics for every frame")
+    asyncio.run(replay(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
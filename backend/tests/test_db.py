@@ -0,0 +1,74 @@
+import pytest
+
+from app.db import AnalysisDB
+
+
+@pytest.fixture
+def db(tmp_path):
+    return AnalysisDB(str(tmp_path / "history.db"))
+
+
+def record(db, created_at, **fields):
+    fields.setdefault("status", "done")
+    return db.record_analysis(created_at=created_at, **fields)
+
+
+def test_pages_cover_every_analysis_once(db):
+    #equal timestamps are ordered by id so no row is skipped or repeated between pages
+    rows = [(1000.0 + i // 3, record(db, 1000.0 + i // 3, user_id="u1")) for i in range(10)]
+    record(db, 2000.0, user_id="u2")
+
+    seen = []
+    cursor = None
+    while True:
+        items, cursor = db.list_analyses(user_id="u1", limit=4, cursor=cursor)
+        seen.extend(item["id"] for item in items)
+        if cursor is None:
+            break
+
+    assert seen == [row_id for _, row_id in sorted(rows, reverse=True)]
+
+
+def test_cursor_survives_fractional_timestamps(db):
+    created = [1700000000.123456789 + i * 1e-6 for i in range(3)]
+    ids = [record(db, t) for t in created]
+
+    first, cursor = db.list_analyses(limit=1)
+    rest, last_cursor = db.list_analyses(limit=5, cursor=cursor)
+    assert [item["id"] for item in first + rest] == ids[::-1]
+    assert last_cursor is None
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "1.5", "x:1", "1.5:y"])
+def test_malformed_cursor_raises(db, cursor):
+    with pytest.raises(ValueError):
+        db.list_analyses(cursor=cursor)
+
+
+def test_unknown_fields_are_rejected(db):
+    with pytest.raises(ValueError):
+        db.record_analysis(status="done", ball=True)
+
+
+def test_session_rollup_tracks_inserts(db):
+    record(db, 100.0, user_id="u1", session_id="s1", frames=100, frames_with_pose=80,
+           duration_seconds=4.0, processing_seconds=2.0)
+    record(db, 130.0, user_id="u1", session_id="s1", frames=50, frames_with_pose=50,
+           duration_seconds=2.0, processing_seconds=1.0)
+    record(db, 120.0, user_id="u1", session_id="s1", status="error")
+    record(db, 200.0, user_id="u2", session_id="s1", frames=10, frames_with_pose=5)
+    record(db, 300.0, user_id="u1")
+
+    (session,) = db.session_aggregates(user_id="u1")
+    assert session["session_id"] == "s1"
+    assert (session["clips"], session["succeeded"], session["failed"]) == (3, 2, 1)
+    assert (session["total_frames"], session["frames_with_pose"]) == (150, 130)
+    assert session["detection_rate"] == pytest.approx(130 / 150)
+    assert session["total_duration_seconds"] == pytest.approx(6.0)
+    #the failed clip has no processing time and is left out of the mean
+    assert session["mean_processing_seconds"] == pytest.approx(1.5)
+    assert (session["started_at"], session["ended_at"]) == (100.0, 130.0)
+
+    #without a user the same session id of different users stays separate
+    sessions = db.session_aggregates()
+    assert [(s["user_id"], s["clips"]) for s in sessions] == [("u2", 1), ("u1", 3)]
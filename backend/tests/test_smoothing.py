@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from app.smoothing import smooth_landmarks, reject_outliers, SMOOTHING_METHODS
+
+FPS = 24
+WRIST = 16
+
+
+def swing_landmarks(noise=0.0, seed=0):
+    """A still pose whose right wrist sweeps from 0.2 to 0.8 of the frame width in 0.25 s"""
+    t = np.arange(2 * FPS) / FPS
+    progress = np.clip((t - 0.8) / 0.25, 0, 1)
+    wrist_x = 0.2 + 0.6 * (0.5 - 0.5 * np.cos(np.pi * progress))
+
+    landmarks = np.zeros((len(t), 33, 4), dtype=np.float32)
+    landmarks[..., :2] = 0.5
+    landmarks[..., 3] = 1.0
+    landmarks[:, WRIST, 0] = wrist_x
+    if noise:
+        rng = np.random.default_rng(seed)
+        landmarks[..., :2] += rng.normal(0, noise, landmarks[..., :2].shape)
+    return landmarks, wrist_x
+
+
+@pytest.mark.parametrize("method", SMOOTHING_METHODS)
+def test_fast_swing_is_not_lagged(method):
+    landmarks, wrist_x = swing_landmarks()
+    smoothed = smooth_landmarks(landmarks, FPS, method=method)[:, WRIST, 0]
+
+    assert np.abs(smoothed - wrist_x).max() < 0.03
+
+    peak_speed = np.abs(np.diff(smoothed)).max() * FPS
+    true_peak_speed = np.abs(np.diff(wrist_x)).max() * FPS
+    assert peak_speed == pytest.approx(true_peak_speed, rel=0.1)
+
+
+@pytest.mark.parametrize("method", SMOOTHING_METHODS)
+def test_noise_is_reduced(method):
+    t = np.arange(10 * FPS) / FPS
+    clean = 0.5 + 0.1 * np.sin(2 * np.pi * t)
+    rng = np.random.default_rng(0)
+    landmarks = np.zeros((len(t), 33, 4), dtype=np.float32)
+    landmarks[..., 3] = 1.0
+    landmarks[..., :3] = (clean + rng.normal(0, 0.005, landmarks[..., :3].shape).T).T
+
+    smoothed = smooth_landmarks(landmarks, FPS, method=method)[..., :3]
+
+    raw_error = np.abs(landmarks[..., :3] - clean[:, None, None]).mean()
+    assert np.abs(smoothed - clean[:, None, None]).mean() < raw_error
+
+
+@pytest.mark.parametrize("visibility, rejected", [(1.0, False), (0.55, True), (0.3, True)])
+def test_outlier_threshold_is_weighted_by_visibility(visibility, rejected):
+    landmarks = np.zeros((2 * FPS, 33, 4), dtype=np.float32)
+    landmarks[..., :3] = 0.5
+    landmarks[..., 3] = 1.0
+    #a small jump that is only trusted from a clearly visible landmark
+    landmarks[10, WRIST, 0] += 0.015
+    landmarks[10, WRIST, 3] = visibility
+
+    positions = reject_outliers(landmarks)
+    assert np.isnan(positions[10, WRIST]).all() == rejected
+    assert not np.isnan(np.delete(positions, 10, axis=0)).any()
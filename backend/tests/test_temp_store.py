@@ -0,0 +1,106 @@
+import os
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.temp_store import TempFileStore, StoreFileResponse
+
+
+def write_file(store, name, size):
+    path = store.path_for(name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TempFileStore(str(tmp_path), ttl_seconds=60, max_bytes=1000, sweep_interval=1)
+
+
+def test_idle_files_expire(store, monkeypatch):
+    old = store.register(write_file(store, "old.mp4", 10))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    recent = store.register(write_file(store, "recent.mp4", 10))
+
+    monkeypatch.setattr(time, "time", lambda: now + 70)
+    assert store.sweep() == [old]
+    assert not os.path.exists(old)
+    assert os.path.exists(recent)
+    assert store.total_bytes == 10
+
+
+def test_least_recently_used_files_are_evicted_first(store):
+    a = store.register(write_file(store, "a.mp4", 400))
+    b = store.register(write_file(store, "b.mp4", 400))
+    #touching a makes b the least recently used
+    assert store.acquire(a)
+    store.release(a)
+
+    c = store.register(write_file(store, "c.mp4", 400))
+    assert not os.path.exists(b)
+    assert os.path.exists(a) and os.path.exists(c)
+    assert store.total_bytes == 800
+
+
+def test_referenced_files_are_never_removed(store, monkeypatch):
+    path = store.register(write_file(store, "busy.mp4", 600), pin=True)
+    store.register(write_file(store, "other.mp4", 600))
+    assert os.path.exists(path)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    store.sweep()
+    assert os.path.exists(path)
+
+    store.release(path)
+    monkeypatch.setattr(time, "time", lambda: now + 7200)
+    assert path in store.sweep()
+
+
+def serve(store, name):
+    async def endpoint(request):
+        path = store.path_for(name)
+        assert store.acquire(path)
+        return StoreFileResponse(path, store, media_type="video/mp4")
+    return TestClient(Starlette(routes=[Route("/video", endpoint)]))
+
+
+@pytest.mark.parametrize("range_header, status", [
+    (None, 200),
+    ("bytes=0-9", 206),
+    ("bytes=5000-6000", 416),
+    ("bytes=abc", 400),
+])
+def test_served_files_are_released(store, monkeypatch, range_header, status):
+    path = store.register(write_file(store, "served.mp4", 100))
+    headers = {"Range": range_header} if range_header else {}
+    response = serve(store, "served.mp4").get("/video", headers=headers)
+    assert response.status_code == status
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    assert store.sweep() == [path]
+
+
+def test_vanished_file_is_released(store, monkeypatch):
+    path = store.register(write_file(store, "gone.mp4", 100))
+    client = serve(store, "gone.mp4")
+
+    real_acquire = store.acquire
+    def acquire_then_delete(p):
+        acquired = real_acquire(p)
+        os.unlink(p)
+        return acquired
+    monkeypatch.setattr(store, "acquire", acquire_then_delete)
+
+    with pytest.raises(RuntimeError):
+        client.get("/video")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    assert store.sweep() == [path]
@@ -0,0 +1,50 @@
+import os
+
+import av
+import numpy as np
+import pytest
+
+from app.video_writers import HlsWriter, hls_supported
+
+FPS = 24
+
+pytestmark = pytest.mark.skipif(not hls_supported(), reason="PyAV has no libx264 encoder")
+
+
+def test_segments_play_back_to_back(tmp_path):
+    updates = []
+    writer = HlsWriter(str(tmp_path / "job.m3u8"), FPS, (161, 91), segment_seconds=1, on_update=updates.append)
+    for i in range(60):
+        writer.write(np.full((91, 161, 3), i * 4, dtype=np.uint8))
+    writer.close()
+
+    segments = sorted(name for name in os.listdir(tmp_path) if name.endswith(".ts"))
+    assert segments == ["job_00000.ts", "job_00001.ts", "job_00002.ts"]
+    assert [os.path.basename(path) for path in updates if path.endswith(".ts")] == segments
+
+    playlist = (tmp_path / "job.m3u8").read_text()
+    assert "#EXT-X-DISCONTINUITY" not in playlist
+    assert playlist.rstrip().endswith("#EXT-X-ENDLIST")
+
+    expected_start = 0.0
+    for name in segments:
+        with av.open(str(tmp_path / name)) as container:
+            stream = container.streams.video[0]
+            frames = list(container.decode(stream))
+        assert stream.codec_context.name == "h264"
+        assert frames[0].key_frame
+        times = [float(frame.pts * stream.time_base) for frame in frames]
+        #each segment picks up exactly where the previous one stopped
+        assert times[0] == pytest.approx(expected_start, abs=1e-3)
+        expected_start = times[-1] + 1 / FPS
+    assert expected_start == pytest.approx(60 / FPS, abs=1e-3)
+
+
+def test_abort_drops_the_unfinished_segment(tmp_path):
+    writer = HlsWriter(str(tmp_path / "job.m3u8"), FPS, (64, 64), segment_seconds=1)
+    for i in range(30):
+        writer.write(np.zeros((64, 64, 3), dtype=np.uint8))
+    writer.abort()
+
+    assert sorted(os.listdir(tmp_path)) == ["job.m3u8", "job_00000.ts"]
+    assert "job_00000.ts" in (tmp_path / "job.m3u8").read_text()
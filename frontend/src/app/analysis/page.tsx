@@ -1,18 +1,89 @@
 'use client';
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useSearchParams } from 'next/navigation';
 import { FiDownload, FiShare2 } from 'react-icons/fi';
 import Link from 'next/link';
+import type Hls from 'hls.js';
+
+//status reported by the backend for a segmented (HLS) analysis
+interface AnalysisJob {
+  status: 'queued' | 'streaming' | 'done' | 'error';
+  segments: number;
+  original_url?: string;
+  processed_url?: string;
+  detail?: string;
+}
 
 const AnalysisPage = () => {
   const searchParams = useSearchParams();
   const processedVideoUrl = searchParams.get('videoUrl');
   const originalVideoUrl = searchParams.get('originalUrl');
   const sampleVideo = searchParams.get('sampleVideo');
+  //set for segmented (HLS) uploads, which are still being processed when the page opens
+  const playlistUrl = searchParams.get('playlistUrl');
+  const statusUrl = searchParams.get('statusUrl');
   
   const [activeTab, setActiveTab] = useState<'processed' | 'original'>('processed');
   const [isDownloading, setIsDownloading] = useState(false);
+  const [job, setJob] = useState<AnalysisJob | null>(null);
+  const videoRef = useRef<HTMLVideoElement>(null);
+
+  //poll the job until processing has finished
+  useEffect(() => {
+    if (!statusUrl) return;
+    let cancelled = false;
+    let timer: ReturnType<typeof setTimeout>;
+
+    const poll = async () => {
+      try {
+        const response = await fetch(statusUrl);
+        if (!response.ok) throw new Error(`Status request failed: ${response.status}`);
+        const status: AnalysisJob = await response.json();
+        if (cancelled) return;
+        setJob(status);
+        if (status.status === 'done' || status.status === 'error') return;
+      } catch (error) {
+        console.error('Job status error:', error);
+      }
+      if (!cancelled) timer = setTimeout(poll, 2000);
+    };
+    poll();
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [statusUrl]);
+
+  //segments can be played as soon as the first one is ready
+  const playlistReady = !!playlistUrl && (job?.status === 'streaming' || job?.status === 'done');
+  const playingPlaylist = activeTab === 'processed' && playlistReady;
+
+  //attach the playlist, Safari plays HLS natively and other browsers go through hls.js
+  useEffect(() => {
+    const video = videoRef.current;
+    if (!playingPlaylist || !video || !playlistUrl) return;
+
+    if (video.canPlayType('application/vnd.apple.mpegurl')) {
+      video.src = playlistUrl;
+      return;
+    }
+
+    let hls: Hls | null = null;
+    let cancelled = false;
+    import('hls.js').then(({ default: HlsPlayer }) => {
+      if (cancelled || !HlsPlayer.isSupported()) return;
+      hls = new HlsPlayer();
+      hls.loadSource(playlistUrl);
+      hls.attachMedia(video);
+    });
+
+    return () => {
+      cancelled = true;
+      hls?.destroy();
+    };
+  }, [playingPlaylist, playlistUrl]);
 
   // For sample videos in a real app, these would be loaded from a database
   const getSampleVideoData = (id: string) => {
@@ -28,9 +99,9 @@ const AnalysisPage = () => {
     return samples[id] || null;
   };
 
-  //determine which video URLs to use
-  let currentProcessedUrl = processedVideoUrl;
-  let currentOriginalUrl = originalVideoUrl;
+  //determine which video URLs to use, segmented uploads get theirs once the job is done
+  let currentProcessedUrl = processedVideoUrl || job?.processed_url || null;
+  let currentOriginalUrl = originalVideoUrl || job?.original_url || null;
   let analysisTitle = 'Your Tennis Swing Analysis';
   
   if (sampleVideo) {
@@ -88,7 +159,7 @@ const AnalysisPage = () => {
     }
   };
 
-  if (!currentProcessedUrl && !sampleVideo) {
+  if (!currentProcessedUrl && !sampleVideo && !playlistUrl) {
     return (
       <div className="bg-black text-white min-h-screen flex flex-col items-center justify-center p-6">
         <div className="text-center max-w-md">
@@ -131,13 +202,21 @@ const AnalysisPage = () => {
           
           {/* Video player */}
           <div className="relative aspect-video bg-black rounded-lg overflow-hidden">
-            <video 
-              key={activeTab} // Force reload when tab changes
-              src={activeTab === 'processed' ? currentProcessedUrl || '' : currentOriginalUrl || ''}
-              controls 
-              className="w-full h-full"
-              autoPlay
-            />
+            {playlistUrl && !playlistReady && activeTab === 'processed' ? (
+              <div className="w-full h-full flex items-center justify-center text-gray-400">
+                {job?.status === 'error' ? job.detail || 'Error processing video' : 'Processing your video...'}
+              </div>
+            ) : (
+              <video 
+                ref={videoRef}
+                key={activeTab} // Force reload when tab changes
+                //the playlist is attached in an effect, the segments play while the rest is processed
+                src={playingPlaylist ? undefined : activeTab === 'processed' ? currentProcessedUrl || '' : currentOriginalUrl || ''}
+                controls 
+                className="w-full h-full"
+                autoPlay
+              />
+            )}
           </div>
           
           {/* Actions */}
@@ -151,7 +230,7 @@ const AnalysisPage = () => {
                   activeTab === 'processed' ? currentProcessedUrl : currentOriginalUrl,
                   activeTab
                 )}
-                disabled={isDownloading}
+                disabled={isDownloading || !(activeTab === 'processed' ? currentProcessedUrl : currentOriginalUrl)}
                 className="flex items-center text-sm text-white bg-gray-800 hover:bg-gray-700 px-3 py-1 rounded-md transition-colors"
               >
                 <FiDownload className="mr-2" />
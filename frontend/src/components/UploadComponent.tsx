@@ -4,7 +4,7 @@ import React, { useRef, useState, ChangeEvent, useEffect } from 'react';
 import { FiUpload, FiVideo } from 'react-icons/fi';
 import Link from 'next/link';
 import Image from 'next/image';
-import axios from 'axios';
+import axios, { AxiosProgressEvent, AxiosResponse } from 'axios';
 import { useSearchParams, useRouter } from 'next/navigation';
 
 const UploadComponent = () => {
@@ -96,19 +96,34 @@ const UploadComponent = () => {
       const formData = new FormData();
       formData.append('file', selectedFile);
 
-      const response = await axios.post("http://localhost:8000/analyze", formData, {
+      const uploadConfig = {
         headers: {
           "Content-Type": "multipart/form-data",
         },
-        onUploadProgress: (progressEvent) => {
+        onUploadProgress: (progressEvent: AxiosProgressEvent) => {
           if (progressEvent.total) {
             const percentCompleted = Math.round((progressEvent.loaded * 100) / progressEvent.total);
             setUploadProgress(percentCompleted);
           }
         }
-      });
+      };
+
+      //ask for segmented output so playback can start while the video is still being processed
+      let response: AxiosResponse;
+      try {
+        response = await axios.post("http://localhost:8000/analyze?output=hls", formData, uploadConfig);
+      } catch (error) {
+        //servers without an H.264 encoder reject HLS output, fall back to a single processed video
+        if (!axios.isAxiosError(error) || error.response?.status !== 400 || !String(error.response.data?.detail).includes('HLS')) {
+          throw error;
+        }
+        setUploadProgress(0);
+        response = await axios.post("http://localhost:8000/analyze", formData, uploadConfig);
+      }
       
-      if (response.data && response.data.processed_url) {
+      if (response.data && response.data.playlist_url) {
+        router.push(`/analysis?playlistUrl=${encodeURIComponent(response.data.playlist_url)}&statusUrl=${encodeURIComponent(response.data.status_url)}`);
+      } else if (response.data && response.data.processed_url) {
         router.push(`/analysis?videoUrl=${response.data.processed_url}&originalUrl=${response.data.original_url}`);
       } else {
         alert("Error processing video. Please try again.");